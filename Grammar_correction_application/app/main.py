@@ -1,11 +1,21 @@
-import difflib
-from typing import List
+import time
 
 import streamlit as st
 from langchain.prompts import ChatPromptTemplate
 from langchain_core.output_parsers import StrOutputParser
 from langchain_openai import ChatOpenAI
 
+from app.src.batching import correct_in_batches, split_into_batches
+from app.src.diff_engine import diff_texts, render_edits_html
+from app.src.edit_operations import request_edits
+from app.src.prescreen import (
+    STRICTNESS_LEVELS,
+    PreScreener,
+    load_word_set,
+    suspicious_batches,
+)
+from app.src.paragraph_cache import CorrectionCache, correct_incrementally
+
 st.set_page_config(page_title="Grammar Correction App")
 parser = StrOutputParser()
 template = """Give the user text: {user_input}\n\n
@@ -16,6 +26,17 @@ template = """Give the user text: {user_input}\n\n
 
 prompt = ChatPromptTemplate.from_template(template)
 
+INCREMENTAL_MODE = "Only re-check paragraphs that changed since the last run"
+LARGE_DOCUMENT_MODE = "Large document (correct sentence batches in parallel)"
+WHOLE_TEXT_MODE = "Whole text in one request"
+EDIT_LIST_MODE = "List of edits only (fewer output tokens)"
+PRESCREEN_MODE = "Only send sentences that fail local checks"
+
+
+@st.cache_resource
+def load_prescreen_words():
+    return load_word_set()
+
 
 def correct_text(
     input_text,
@@ -35,54 +56,25 @@ def correct_text(
     return grammar_correction_chain.invoke({"user_input": input_text})
 
 
-def get_incorrect_words(
-    original: str,
-    corrected: str,
-) -> List[str]:
-    """
-    Identifies incorrect words in the original text by comparing
-    it with the corrected text.
-
-    Args:
-        original (str): The original text.
-        corrected (str): The corrected text.
-
-    Returns:
-        List[str]: A list of incorrect words that were changed in the
-                   corrected text.
-    """
-    d = difflib.Differ()
-    diff = list(d.compare(original.split(), corrected.split()))
-    incorrect_words = [word[2:] for word in diff if word.startswith("- ")]
-    return incorrect_words
-
-
-def highlight_incorrect_words(
-    input_text: str,
-    incorrect_words: List[str],
-) -> str:
+def correct_paragraphs(
+    paragraphs,
+    llm,
+):
     """
-    Highlights incorrect words in the input text by underlining them
-    with a wavy red line.
+    Corrects several paragraphs with one concurrent batch of model calls.
 
     Args:
-        input_text (str): The original input text.
-        incorrect_words (List[str]): A list of incorrect words to be
-                                     highlighted.
+        paragraphs (List[str]): The paragraphs to be corrected.
+        llm (ChatOpenAI): The language model instance.
 
     Returns:
-        str: The text with incorrect words highlighted.
+        List[str]: The corrected paragraphs, in order.
     """
-    words = input_text.split()
-    highlighted_text = " ".join(
-        (
-            f"<span style='text-decoration: underline wavy red;'>{word}</span>"
-            if word in incorrect_words
-            else word
-        )
-        for word in words
+    grammar_correction_chain = prompt | llm | parser
+    corrected = grammar_correction_chain.batch(
+        [{"user_input": paragraph} for paragraph in paragraphs]
     )
-    return highlighted_text
+    return [paragraph.strip() for paragraph in corrected]
 
 
 def main():
@@ -96,6 +88,8 @@ def main():
         st.session_state["api_key"] = ""
     if "model_name" not in st.session_state:
         st.session_state["model_name"] = "gpt-4o"
+    if "correction_cache" not in st.session_state:
+        st.session_state["correction_cache"] = CorrectionCache()
 
     api_key = st.text_input(
         "Enter your OpenAI API Key",
@@ -112,6 +106,32 @@ def main():
         "Enter your text below and click 'Correct' to see the corrected version with highlighted errors."  # noqa
     )
     input_text = st.text_area("Enter Text", height=200)
+    correction_mode = st.radio(
+        "Correction mode",
+        [
+            WHOLE_TEXT_MODE,
+            INCREMENTAL_MODE,
+            LARGE_DOCUMENT_MODE,
+            PRESCREEN_MODE,
+            EDIT_LIST_MODE,
+        ],
+        help=(
+            "The paragraph, large document and pre-screen modes correct "
+            "parts of the text separately, so the model sees no context "
+            "across them."
+        ),
+    )
+    if correction_mode == PRESCREEN_MODE:
+        strictness = st.select_slider(
+            "Pre-screen strictness", STRICTNESS_LEVELS, value="normal"
+        )
+    if correction_mode in (LARGE_DOCUMENT_MODE, PRESCREEN_MODE):
+        batch_tokens = st.number_input(
+            "Maximum tokens per batch", min_value=100, value=800, step=100
+        )
+        max_concurrency = st.number_input(
+            "Maximum concurrent requests", min_value=1, value=4, step=1
+        )
 
     if st.button("Correct"):
         st.session_state["api_key"] = api_key
@@ -125,13 +145,70 @@ def main():
                     temperature=0,
                 )
 
-                corrected_text = correct_text(input_text, llm)
-                incorrect_words = get_incorrect_words(
-                    input_text, corrected_text
-                )
-                highlighted_text = highlight_incorrect_words(
-                    input_text, incorrect_words
+                edits = None
+                start = time.perf_counter()
+                if correction_mode == EDIT_LIST_MODE:
+                    corrected_text, edits, rejected, usage = request_edits(
+                        input_text, llm
+                    )
+                    st.caption(
+                        f"{len(edits)} edits applied, {rejected} rejected, "
+                        f"{usage.get('output_tokens', 'unknown')} output "
+                        "tokens."
+                    )
+                elif correction_mode in (LARGE_DOCUMENT_MODE, PRESCREEN_MODE):
+                    spans = split_into_batches(
+                        input_text, batch_tokens, llm.get_num_tokens
+                    )
+                    if correction_mode == PRESCREEN_MODE:
+                        all_requests = len(spans)
+                        screener = PreScreener(
+                            load_prescreen_words(), strictness
+                        )
+                        spans, stats = suspicious_batches(
+                            input_text,
+                            screener,
+                            batch_tokens,
+                            llm.get_num_tokens,
+                        )
+                        st.caption(
+                            f"{stats['sentences'] - stats['suspicious']} of "
+                            f"{stats['sentences']} sentences passed local "
+                            f"checks; {len(spans)} requests sent, "
+                            f"{max(all_requests - len(spans), 0)} saved."
+                        )
+                    progress = st.progress(0.0, text="Correcting...")
+                    corrected_text, edits = correct_in_batches(
+                        input_text,
+                        spans,
+                        lambda batch: correct_text(batch, llm).strip(),
+                        max_workers=max_concurrency,
+                        on_progress=lambda done: progress.progress(
+                            done / max(len(spans), 1),
+                            text=f"Corrected {done} of {len(spans)} batches",
+                        ),
+                    )
+                elif correction_mode == INCREMENTAL_MODE:
+                    corrected_text, stats = correct_incrementally(
+                        input_text,
+                        st.session_state["model_name"],
+                        template,
+                        st.session_state["correction_cache"],
+                        lambda paragraphs: correct_paragraphs(paragraphs, llm),
+                    )
+                    st.caption(
+                        f"{stats['corrected']} of {stats['paragraphs']} "
+                        "paragraphs sent to the model, "
+                        f"{stats['cached']} reused from earlier runs."
+                    )
+                else:
+                    corrected_text = correct_text(input_text, llm)
+                st.caption(
+                    f"Corrected in {time.perf_counter() - start:.1f}s."
                 )
+                if edits is None:
+                    edits = diff_texts(input_text, corrected_text)
+                highlighted_text = render_edits_html(input_text, edits)
 
                 st.subheader("Original Text with Highlighted Errors")
                 st.markdown(highlighted_text, unsafe_allow_html=True)
@@ -0,0 +1,129 @@
+import re
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+from app.src.diff_engine import Edit, diff_texts
+
+BOUNDARY_PATTERN = re.compile(r"\n\s*\n|(?<=[.!?])\s+")
+
+
+def split_sentences(text):
+    """
+    Finds the sentences of a text, treating paragraph breaks and sentence
+    punctuation followed by whitespace as boundaries.
+
+    Args:
+        text (str): The text to split.
+
+    Returns:
+        List[tuple]: ``(start, end)`` character offsets of each sentence,
+                     without the surrounding whitespace.
+    """
+    sentences = []
+    position = 0
+    for boundary in BOUNDARY_PATTERN.finditer(text):
+        if boundary.start() > position:
+            sentences.append((position, boundary.start()))
+        position = boundary.end()
+    if position < len(text) and text[position:].strip():
+        sentences.append((position, len(text.rstrip())))
+    return sentences
+
+
+def group_spans(text, spans, max_tokens, count_tokens):
+    """
+    Packs consecutive spans into batches of at most ``max_tokens`` tokens.
+    A single span over the limit forms its own batch.
+
+    Args:
+        text (str): The text the spans refer to.
+        spans (List[tuple]): Consecutive ``(start, end)`` offsets.
+        max_tokens (int): Upper bound on tokens per batch.
+        count_tokens (callable): Returns the token count of a string.
+
+    Returns:
+        List[tuple]: ``(start, end)`` offsets of each batch.
+    """
+    batches = []
+    batch_start, batch_end, batch_tokens = None, None, 0
+    for start, end in spans:
+        tokens = count_tokens(text[start:end])
+        if batch_start is not None and batch_tokens + tokens > max_tokens:
+            batches.append((batch_start, batch_end))
+            batch_start, batch_tokens = None, 0
+        if batch_start is None:
+            batch_start = start
+        batch_end = end
+        batch_tokens += tokens
+    if batch_start is not None:
+        batches.append((batch_start, batch_end))
+    return batches
+
+
+def split_into_batches(text, max_tokens, count_tokens):
+    """
+    Splits text on paragraph and sentence boundaries into batches of at most
+    ``max_tokens`` tokens. A single sentence over the limit forms its own
+    batch.
+
+    Args:
+        text (str): The text to split.
+        max_tokens (int): Upper bound on tokens per batch.
+        count_tokens (callable): Returns the token count of a string.
+
+    Returns:
+        List[tuple]: ``(start, end)`` character offsets of each batch in
+                     ``text``. The whitespace between batches is not part of
+                     any batch.
+    """
+    return group_spans(text, split_sentences(text), max_tokens, count_tokens)
+
+
+def correct_in_batches(text,
+                       spans,
+                       correct_batch,
+                       max_workers=4,
+                       on_progress=None):
+    """
+    Corrects each batch concurrently and stitches the results back in order.
+
+    Args:
+        text (str): The original text.
+        spans (List[tuple]): Batch offsets from ``split_into_batches``.
+        correct_batch (callable): Corrects the text of one batch.
+        max_workers (int): Maximum number of concurrent model calls.
+        on_progress (callable, optional): Called with the number of finished
+                                          batches each time one completes.
+
+    Returns:
+        tuple: The corrected text and a list of ``Edit`` objects whose
+               offsets refer to the original ``text``.
+    """
+    corrections = [None] * len(spans)
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        futures = {
+            executor.submit(correct_batch, text[start:end]): index
+            for index, (start, end) in enumerate(spans)
+        }
+        for done, future in enumerate(as_completed(futures), start=1):
+            corrections[futures[future]] = future.result()
+            if on_progress:
+                on_progress(done)
+
+    pieces = []
+    edits = []
+    position = 0
+    for (start, end), corrected in zip(spans, corrections):
+        pieces.append(text[position:start])
+        pieces.append(corrected)
+        position = end
+        for edit in diff_texts(text[start:end], corrected):
+            edits.append(
+                Edit(
+                    edit.tag,
+                    edit.start + start,
+                    edit.end + start,
+                    edit.replacement,
+                )
+            )
+    pieces.append(text[position:])
+    return "".join(pieces), edits
@@ -0,0 +1,228 @@
+import difflib
+import html
+import re
+from bisect import bisect_left
+from collections import namedtuple
+
+TOKEN_PATTERN = re.compile(r"\S+")
+
+# Below this many tokens per side a gap is handed to difflib directly;
+# above it, the gap is first split further on unique anchor tokens.
+SMALL_GAP_TOKENS = 64
+ANCHOR_WIDTHS = (1, 4, 16)
+
+Token = namedtuple("Token", ["text", "start", "end"])
+Edit = namedtuple("Edit", ["tag", "start", "end", "replacement"])
+Edit.__doc__ = """
+A single change to the original text.
+
+Attributes:
+    tag (str): ``"replace"``, ``"delete"`` or ``"insert"``.
+    start (int): Character offset in the original text where the edit starts.
+    end (int): Character offset where it ends; equal to ``start`` for
+               insertions.
+    replacement (str): Text from the corrected version, empty for deletions.
+"""
+
+
+def tokenize(text):
+    """
+    Splits text into whitespace-separated tokens with their offsets.
+
+    Args:
+        text (str): The text to tokenize.
+
+    Returns:
+        List[Token]: Tokens in order, with character offsets into ``text``.
+    """
+    return [
+        Token(match.group(), match.start(), match.end())
+        for match in TOKEN_PATTERN.finditer(text)
+    ]
+
+
+def _unique_anchors(a, b, a_lo, a_hi, b_lo, b_hi, width):
+    """
+    Finds runs of ``width`` tokens occurring exactly once in both ranges and
+    returns the longest chain of them that appears in the same order on both
+    sides, as non-overlapping ``(i, j)`` start positions.
+    """
+    a_counts, b_counts = {}, {}
+    for i in range(a_lo, a_hi - width + 1):
+        key = tuple(a[i:i + width])
+        a_counts[key] = i if key not in a_counts else -1
+    for j in range(b_lo, b_hi - width + 1):
+        key = tuple(b[j:j + width])
+        b_counts[key] = j if key not in b_counts else -1
+
+    pairs = [
+        (i, b_counts[key])
+        for key, i in a_counts.items()
+        if i >= 0 and b_counts.get(key, -1) >= 0
+    ]
+    pairs.sort()
+
+    # Longest increasing subsequence on the b positions, O(n log n).
+    tails, tail_index, previous = [], [], [None] * len(pairs)
+    for k, (_, j) in enumerate(pairs):
+        position = bisect_left(tails, j)
+        if position == len(tails):
+            tails.append(j)
+            tail_index.append(k)
+        else:
+            tails[position] = j
+            tail_index[position] = k
+        previous[k] = tail_index[position - 1] if position else None
+
+    chain = []
+    k = tail_index[-1] if tail_index else None
+    while k is not None:
+        chain.append(pairs[k])
+        k = previous[k]
+    chain.reverse()
+
+    anchors = []
+    for i, j in chain:
+        if anchors and (
+            i < anchors[-1][0] + width or j < anchors[-1][1] + width
+        ):
+            continue
+        anchors.append((i, j))
+    return anchors
+
+
+def _align(a, b, a_lo, a_hi, b_lo, b_hi, opcodes):
+    """
+    Appends opcodes aligning ``a[a_lo:a_hi]`` with ``b[b_lo:b_hi]``.
+
+    Common prefixes and suffixes are matched directly, the rest is split on
+    unique anchor tokens (patience diff) and only small gaps without anchors
+    fall back to ``difflib.SequenceMatcher``. For ordinary text this keeps
+    the work close to linear in the document length.
+    """
+    while a_lo < a_hi and b_lo < b_hi and a[a_lo] == b[b_lo]:
+        opcodes.append(("equal", a_lo, a_lo + 1, b_lo, b_lo + 1))
+        a_lo += 1
+        b_lo += 1
+    suffix = []
+    while a_lo < a_hi and b_lo < b_hi and a[a_hi - 1] == b[b_hi - 1]:
+        a_hi -= 1
+        b_hi -= 1
+        suffix.append(("equal", a_hi, a_hi + 1, b_hi, b_hi + 1))
+
+    if a_lo == a_hi and b_lo == b_hi:
+        pass
+    elif a_lo == a_hi:
+        opcodes.append(("insert", a_lo, a_lo, b_lo, b_hi))
+    elif b_lo == b_hi:
+        opcodes.append(("delete", a_lo, a_hi, b_lo, b_lo))
+    else:
+        small = (
+            a_hi - a_lo <= SMALL_GAP_TOKENS and b_hi - b_lo <= SMALL_GAP_TOKENS
+        )
+        anchors, width = [], 1
+        if not small:
+            # Try single tokens first; in long texts where every word
+            # repeats, runs of tokens are still unique.
+            for width in ANCHOR_WIDTHS:
+                anchors = _unique_anchors(
+                    a, b, a_lo, a_hi, b_lo, b_hi, width
+                )
+                if anchors:
+                    break
+        if anchors:
+            for i, j in anchors:
+                _align(a, b, a_lo, i, b_lo, j, opcodes)
+                opcodes.append(("equal", i, i + width, j, j + width))
+                a_lo, b_lo = i + width, j + width
+            _align(a, b, a_lo, a_hi, b_lo, b_hi, opcodes)
+        else:
+            matcher = difflib.SequenceMatcher(
+                None, a[a_lo:a_hi], b[b_lo:b_hi], autojunk=not small
+            )
+            for tag, i1, i2, j1, j2 in matcher.get_opcodes():
+                opcodes.append(
+                    (tag, a_lo + i1, a_lo + i2, b_lo + j1, b_lo + j2)
+                )
+
+    opcodes.extend(reversed(suffix))
+
+
+def diff_texts(original, corrected):
+    """
+    Computes the token-level edits that turn ``original`` into
+    ``corrected``, anchored to character offsets in ``original``.
+
+    Args:
+        original (str): The original text.
+        corrected (str): The corrected text.
+
+    Returns:
+        List[Edit]: Non-overlapping edits ordered by position.
+    """
+    original_tokens = tokenize(original)
+    corrected_tokens = tokenize(corrected)
+    a = [token.text for token in original_tokens]
+    b = [token.text for token in corrected_tokens]
+
+    opcodes = []
+    _align(a, b, 0, len(a), 0, len(b), opcodes)
+
+    edits = []
+    for tag, i1, i2, j1, j2 in opcodes:
+        if tag == "equal":
+            continue
+        replacement = " ".join(b[j1:j2])
+        if i1 < i2:
+            start = original_tokens[i1].start
+            end = original_tokens[i2 - 1].end
+        else:
+            start = end = (
+                original_tokens[i1].start
+                if i1 < len(original_tokens)
+                else len(original)
+            )
+        edits.append(Edit(tag, start, end, replacement))
+    return edits
+
+
+def render_edits_html(original, edits):
+    """
+    Renders the original text with each edit marked at its exact position.
+
+    Replaced and deleted words are underlined with a wavy red line (deleted
+    words are also struck through) and the corrected or inserted words are
+    shown in green right after them.
+
+    Args:
+        original (str): The original text.
+        edits (List[Edit]): Edits returned by ``diff_texts``.
+
+    Returns:
+        str: HTML for ``st.markdown(..., unsafe_allow_html=True)``.
+    """
+    parts = []
+    position = 0
+    for edit in edits:
+        parts.append(html.escape(original[position:edit.start]))
+        removed = html.escape(original[edit.start:edit.end])
+        added = html.escape(edit.replacement)
+        if edit.tag == "delete":
+            parts.append(
+                "<span style='text-decoration: underline wavy red "
+                f"line-through;'>{removed}</span>"
+            )
+        elif edit.tag == "insert" and (
+            edit.start > 0 and not original[edit.start - 1].isspace()
+        ):
+            parts.append(f" <span style='color: green;'>{added}</span>")
+        elif edit.tag == "insert":
+            parts.append(f"<span style='color: green;'>{added}</span> ")
+        else:
+            parts.append(
+                "<span style='text-decoration: underline wavy red;'>"
+                f"{removed}</span> <span style='color: green;'>{added}</span>"
+            )
+        position = edit.end
+    parts.append(html.escape(original[position:]))
+    return "".join(parts)
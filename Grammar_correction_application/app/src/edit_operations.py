@@ -0,0 +1,160 @@
+from langchain.prompts import ChatPromptTemplate
+from langchain_core.exceptions import OutputParserException
+from langchain_core.output_parsers import JsonOutputParser
+
+from app.src.diff_engine import Edit
+
+edits_template = """Find the grammatical and spelling errors in the user text below.
+Do not rewrite the text. Return only a JSON array with one object per error,
+in the order the errors appear, using these keys:
+  "before": up to three words that come right before the error, copied exactly
+  "original": the exact erroneous text, copied exactly (empty to insert text)
+  "replacement": the corrected text (empty to delete)
+Return [] if the text has no errors.
+
+User text:
+{user_input}"""
+
+edits_prompt = ChatPromptTemplate.from_template(edits_template)
+edits_parser = JsonOutputParser()
+
+
+def _preceded_by(text, index, before):
+    """
+    Checks whether the text before ``index``, ignoring trailing whitespace,
+    ends with ``before``. Compares in place instead of slicing, so checking
+    a match costs the same anywhere in a long document.
+    """
+    end = index
+    while end and text[end - 1].isspace():
+        end -= 1
+    return text.endswith(before, 0, end)
+
+
+def _find_operation(text, before, original, cursor):
+    """
+    Returns the offset of ``original`` at or after ``cursor`` whose preceding
+    text ends with ``before``, or -1.
+    """
+    if not original:
+        # Pure insertion: anchor right after the ``before`` words.
+        index = text.find(before, cursor) if before else -1
+        return index + len(before) if index != -1 else -1
+
+    index = text.find(original, cursor)
+    while index != -1:
+        if not before or _preceded_by(text, index, before):
+            return index
+        index = text.find(original, index + 1)
+    return -1
+
+
+def resolve_operations(text, operations):
+    """
+    Validates edit operations returned by the model and anchors them to
+    character offsets in ``text``.
+
+    Operations are resolved in order; one whose text cannot be found after
+    the previous edit (or that would be a no-op) is rejected.
+
+    Args:
+        text (str): The original text.
+        operations (list): Dicts with ``before``, ``original`` and
+                           ``replacement`` keys.
+
+    Returns:
+        tuple: A list of ``Edit`` objects ordered by position and the number
+               of rejected operations.
+    """
+    edits = []
+    rejected = 0
+    cursor = 0
+    for operation in operations if isinstance(operations, list) else []:
+        if not isinstance(operation, dict):
+            rejected += 1
+            continue
+        before = str(operation.get("before") or "").strip()
+        original = str(operation.get("original") or "")
+        replacement = str(operation.get("replacement") or "")
+        if original == replacement:
+            rejected += 1
+            continue
+
+        start = _find_operation(text, before, original, cursor)
+        if start == -1 and cursor:
+            # Tolerate operations listed out of order, as long as they do
+            # not overlap an edit that was already accepted.
+            start = _find_operation(text, before, original, 0)
+            end = start + len(original)
+            if any(edit.start < end and start < edit.end for edit in edits):
+                start = -1
+        if start == -1:
+            rejected += 1
+            continue
+
+        end = start + len(original)
+        if not original:
+            tag = "insert"
+        elif not replacement:
+            tag = "delete"
+        else:
+            tag = "replace"
+        edits.append(Edit(tag, start, end, replacement))
+        cursor = max(cursor, end)
+
+    edits.sort(key=lambda edit: (edit.start, edit.end))
+    return edits, rejected
+
+
+def apply_edits(text, edits):
+    """
+    Applies position-anchored edits to the original text.
+
+    Args:
+        text (str): The original text.
+        edits (List[Edit]): Non-overlapping edits ordered by position.
+
+    Returns:
+        str: The corrected text.
+    """
+    pieces = []
+    position = 0
+    for edit in edits:
+        pieces.append(text[position:edit.start])
+        replacement = edit.replacement
+        if edit.tag == "insert":
+            if edit.start > 0 and not text[edit.start - 1].isspace():
+                replacement = " " + replacement
+            elif edit.start < len(text) and not text[edit.start].isspace():
+                replacement = replacement + " "
+        elif edit.tag == "delete":
+            # Drop one adjacent space so the deletion does not leave a gap.
+            if edit.end < len(text) and text[edit.end] == " ":
+                edit = edit._replace(end=edit.end + 1)
+        pieces.append(replacement)
+        position = edit.end
+    pieces.append(text[position:])
+    return "".join(pieces)
+
+
+def request_edits(input_text, llm):
+    """
+    Asks the model for a compact list of edits instead of the full corrected
+    text, then validates and applies them locally.
+
+    Args:
+        input_text (str): The text to be corrected.
+        llm (ChatOpenAI): The language model instance.
+
+    Returns:
+        tuple: The corrected text, the accepted ``Edit`` objects, the number
+               of rejected operations and the model's ``usage_metadata``.
+    """
+    message = (edits_prompt | llm).invoke({"user_input": input_text})
+    try:
+        operations = edits_parser.parse(message.content)
+    except OutputParserException:
+        operations = []
+    edits, rejected = resolve_operations(input_text, operations)
+    usage = getattr(message, "usage_metadata", None) or {}
+    return apply_edits(input_text, edits), edits, rejected, usage
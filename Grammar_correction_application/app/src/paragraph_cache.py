@@ -0,0 +1,128 @@
+import hashlib
+import re
+from collections import OrderedDict
+
+PARAGRAPH_SPLIT_PATTERN = re.compile(r"(\n\s*\n)")
+
+
+def split_paragraphs(text):
+    """
+    Splits text into paragraphs and the blank-line separators between them.
+
+    Args:
+        text (str): The text to split.
+
+    Returns:
+        tuple: ``(paragraphs, separators)`` where ``separators[i]`` follows
+               ``paragraphs[i]``; joining them back gives the original text.
+    """
+    parts = PARAGRAPH_SPLIT_PATTERN.split(text)
+    return parts[0::2], parts[1::2] + [""]
+
+
+def _digest(text):
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+
+class CorrectionCache:
+    """
+    An in-memory LRU cache of corrected paragraphs keyed by
+    (paragraph hash, model, prompt hash).
+    """
+
+    def __init__(self, max_entries=5000):
+        """
+        Args:
+            max_entries (int): Number of paragraphs kept before the least
+                               recently used ones are evicted.
+        """
+        self.max_entries = max_entries
+        self._entries = OrderedDict()
+
+    @staticmethod
+    def make_key(paragraph, model, prompt_text):
+        """
+        Builds the cache key for a paragraph.
+
+        Args:
+            paragraph (str): The original paragraph.
+            model (str): The model name.
+            prompt_text (str): The prompt template the paragraph is sent with.
+
+        Returns:
+            tuple: The cache key.
+        """
+        return _digest(paragraph), model, _digest(prompt_text)
+
+    def get(self, key):
+        if key not in self._entries:
+            return None
+        self._entries.move_to_end(key)
+        return self._entries[key]
+
+    def put(self, key, corrected):
+        self._entries[key] = corrected
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+    def __len__(self):
+        return len(self._entries)
+
+
+def correct_incrementally(input_text,
+                          model,
+                          prompt_text,
+                          cache,
+                          correct_paragraphs):
+    """
+    Corrects a document paragraph by paragraph, only sending paragraphs
+    that are new or changed since the last run to the model.
+
+    Args:
+        input_text (str): The document to correct.
+        model (str): The model name, part of the cache key.
+        prompt_text (str): The prompt template, part of the cache key.
+        cache (CorrectionCache): Cache of previously corrected paragraphs.
+        correct_paragraphs (callable): Takes a list of paragraphs and returns
+                                       their corrections in order.
+
+    Returns:
+        tuple: The corrected document and a dict with ``paragraphs``,
+               ``cached`` and ``corrected`` counts.
+    """
+    paragraphs, separators = split_paragraphs(input_text)
+    keys = [
+        CorrectionCache.make_key(paragraph, model, prompt_text)
+        if paragraph.strip()
+        else None
+        for paragraph in paragraphs
+    ]
+
+    results = {}
+    misses = OrderedDict()
+    for key, paragraph in zip(keys, paragraphs):
+        if key is None or key in results or key in misses:
+            continue
+        cached = cache.get(key)
+        if cached is None:
+            misses[key] = paragraph
+        else:
+            results[key] = cached
+
+    if misses:
+        corrections = correct_paragraphs(list(misses.values()))
+        for key, corrected in zip(misses, corrections):
+            cache.put(key, corrected)
+            results[key] = corrected
+
+    output = "".join(
+        (results[key] if key else paragraph) + separator
+        for key, paragraph, separator in zip(keys, paragraphs, separators)
+    )
+    stats = {
+        "paragraphs": sum(1 for key in keys if key),
+        "cached": len(results) - len(misses),
+        "corrected": len(misses),
+    }
+    return output, stats
@@ -0,0 +1,162 @@
+import re
+
+from app.src.batching import group_spans, split_sentences
+
+WORD_PATTERN = re.compile(r"[A-Za-z]+(?:'[A-Za-z]+)*")
+REPEATED_WORD_PATTERN = re.compile(r"\b(\w+)\s+\1\b", re.IGNORECASE)
+SPACING_PATTERN = re.compile(r"\s[,.;:!?]|[,;:](?=[A-Za-z])|  +")
+ARTICLE_PATTERN = re.compile(
+    r"\b(a)\s+([aeiouAEIOU]\w*)|\b(an)\s+([^aeiouAEIOU\W\d]\w*)"
+)
+LOWERCASE_I_PATTERN = re.compile(r"(?<![\w'])i(?![\w'])")
+CONFUSION_PATTERN = re.compile(
+    r"\b(could|should|would|must) of\b|\balot\b|\byour welcome\b"
+    r"|\bthere (is|are) (alot|less)\b|\bthen (me|him|her|us|them)\b"
+    r"|\bit's own\b|\bwho's (car|house|book|idea)\b",
+    re.IGNORECASE,
+)
+# Words starting with a vowel letter that take "a", and the reverse.
+ARTICLE_EXCEPTIONS = {
+    "one", "once", "unit", "union", "unique", "universe", "university",
+    "user", "usual", "useful", "european", "eulogy", "hour", "honest",
+    "honor", "honour", "heir", "herb",
+}
+
+STRICTNESS_LEVELS = ["lenient", "normal", "strict"]
+# Sentences longer than this are always sent to the model in strict mode.
+STRICT_MAX_WORDS = 40
+
+
+def load_word_set(path=None):
+    """
+    Loads the dictionary used by the spell check into a set of lowercase
+    words.
+
+    Args:
+        path (str, optional): A word list with one word per line. When not
+                              given, the English dictionary bundled with
+                              ``pyspellchecker`` is used.
+
+    Returns:
+        frozenset: The known words.
+    """
+    if path:
+        with open(path, "r", encoding="utf-8") as word_file:
+            return frozenset(
+                line.strip().lower() for line in word_file if line.strip()
+            )
+
+    from spellchecker import SpellChecker
+
+    return frozenset(SpellChecker(language="en").word_frequency.keys())
+
+
+class PreScreener:
+    """
+    Flags sentences that are likely to contain errors using a dictionary
+    spell check and a handful of cheap rules, so that sentences which look
+    clean can skip the model.
+    """
+
+    def __init__(self, words, strictness="normal"):
+        """
+        Args:
+            words (frozenset): Known lowercase words.
+            strictness (str): One of ``STRICTNESS_LEVELS``. ``lenient`` only
+                              checks spelling of lowercase words and repeated
+                              words; ``normal`` adds punctuation, spacing,
+                              capitalization and common-confusion rules;
+                              ``strict`` also spell checks capitalized words
+                              and sends every long sentence to the model.
+        """
+        if strictness not in STRICTNESS_LEVELS:
+            raise ValueError(f"Unknown strictness: {strictness}")
+        self.words = words
+        self.level = STRICTNESS_LEVELS.index(strictness)
+
+    def _is_known(self, word):
+        lowered = word.lower()
+        if lowered in self.words:
+            return True
+        for suffix in ("'s", "'ll", "'re", "'ve", "'d", "n't"):
+            stem = lowered[: -len(suffix)]
+            if lowered.endswith(suffix) and stem in self.words:
+                return True
+        return False
+
+    def check(self, sentence):
+        """
+        Lists the reasons a sentence looks suspicious.
+
+        Args:
+            sentence (str): The sentence to check.
+
+        Returns:
+            List[str]: The failed checks; empty if the sentence looks clean.
+        """
+        reasons = []
+        for index, match in enumerate(WORD_PATTERN.finditer(sentence)):
+            word = match.group()
+            proper_noun = index > 0 and word[0].isupper()
+            if word.isupper() or (proper_noun and self.level < 2):
+                # Acronyms and, below strict, likely proper nouns.
+                continue
+            if not self._is_known(word):
+                reasons.append(f"unknown word '{word}'")
+                break
+        if REPEATED_WORD_PATTERN.search(sentence):
+            reasons.append("repeated word")
+        if self.level < 1:
+            return reasons
+
+        stripped = sentence.strip()
+        if stripped[:1].islower():
+            reasons.append("lowercase sentence start")
+        if stripped[-1:] not in ".!?\"')":
+            reasons.append("missing end punctuation")
+        if SPACING_PATTERN.search(sentence):
+            reasons.append("spacing around punctuation")
+        if LOWERCASE_I_PATTERN.search(sentence):
+            reasons.append("lowercase 'i'")
+        if CONFUSION_PATTERN.search(sentence):
+            reasons.append("commonly confused words")
+        for match in ARTICLE_PATTERN.finditer(sentence):
+            following = (match.group(2) or match.group(4)).lower()
+            if following not in ARTICLE_EXCEPTIONS:
+                reasons.append("article mismatch")
+                break
+        if self.level >= 2 and len(stripped.split()) > STRICT_MAX_WORDS:
+            reasons.append("long sentence")
+        return reasons
+
+
+def suspicious_batches(text, screener, max_tokens, count_tokens):
+    """
+    Pre-screens every sentence and groups runs of adjacent suspicious
+    sentences into token-bounded batches for the model.
+
+    Args:
+        text (str): The text to check.
+        screener (PreScreener): The pre-screen to apply.
+        max_tokens (int): Upper bound on tokens per batch.
+        count_tokens (callable): Returns the token count of a string.
+
+    Returns:
+        tuple: ``(start, end)`` offsets of the batches to send to the model
+               and a dict with ``sentences`` and ``suspicious`` counts.
+    """
+    sentences = split_sentences(text)
+    batches = []
+    run = []
+    suspicious = 0
+    for start, end in sentences:
+        if screener.check(text[start:end]):
+            run.append((start, end))
+            suspicious += 1
+            continue
+        if run:
+            batches.extend(group_spans(text, run, max_tokens, count_tokens))
+            run = []
+    if run:
+        batches.extend(group_spans(text, run, max_tokens, count_tokens))
+    return batches, {"sentences": len(sentences), "suspicious": suspicious}
@@ -0,0 +1,92 @@
+"""
+Compares the span-based diff engine with the previous difflib.Differ and
+list-lookup highlighter on synthetic documents of growing size.
+
+Run from this directory:
+
+    python benchmark_diff.py
+"""
+
+import argparse
+import difflib
+import random
+import time
+
+from app.src.diff_engine import diff_texts, render_edits_html
+
+WORDS = (
+    "the of and to a in is it you that he was for on are with as his they "
+    "be at one have this from or had by word but what some we can out other "
+    "were all there when up use your how said an each she which do their "
+    "time if will way about many then them write would like so these her "
+    "long make thing see him two has look more day could go come did number "
+    "sound no most people my over know water than call first who may down "
+    "side been now find"
+).split()
+
+
+def legacy_highlight(original, corrected):
+    """The highlighter as it was before the diff engine was introduced."""
+    diff = list(difflib.Differ().compare(original.split(), corrected.split()))
+    incorrect_words = [word[2:] for word in diff if word.startswith("- ")]
+    return " ".join(
+        (
+            f"<span style='text-decoration: underline wavy red;'>{word}</span>"
+            if word in incorrect_words
+            else word
+        )
+        for word in original.split()
+    )
+
+
+def make_document(word_count, error_rate, rng):
+    original = [rng.choice(WORDS) for _ in range(word_count)]
+    corrected = list(original)
+    for _ in range(max(1, int(word_count * error_rate))):
+        index = rng.randrange(len(corrected))
+        roll = rng.random()
+        if roll < 0.6:
+            corrected[index] = corrected[index] + "s"
+        elif roll < 0.8:
+            del corrected[index]
+        else:
+            corrected.insert(index, rng.choice(WORDS))
+    return " ".join(original), " ".join(corrected)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument(
+        "--sizes", type=int, nargs="+", default=[1000, 5000, 20000, 100000]
+    )
+    parser.add_argument("--error-rate", type=float, default=0.02)
+    parser.add_argument(
+        "--legacy-max-words",
+        type=int,
+        default=50000,
+        help="Skip the legacy highlighter above this size; it stalls.",
+    )
+    args = parser.parse_args()
+
+    rng = random.Random(0)
+    print(f"{'words':>8} {'edits':>6} {'engine s':>9} {'legacy s':>9}")
+    for size in args.sizes:
+        original, corrected = make_document(size, args.error_rate, rng)
+
+        start = time.perf_counter()
+        edits = diff_texts(original, corrected)
+        render_edits_html(original, edits)
+        engine_seconds = time.perf_counter() - start
+
+        if size <= args.legacy_max_words:
+            start = time.perf_counter()
+            legacy_highlight(original, corrected)
+            legacy = f"{time.perf_counter() - start:9.3f}"
+        else:
+            legacy = f"{'skipped':>9}"
+
+        print(f"{size:>8} {len(edits):>6} {engine_seconds:9.3f} {legacy}")
+
+
+if __name__ == "__main__":
+    main()
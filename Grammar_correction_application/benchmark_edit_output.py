@@ -0,0 +1,93 @@
+"""
+Compares output tokens and latency of the full-rewrite correction prompt
+with the edit-list prompt on the same text. Needs an OpenAI API key in
+OPENAI_API_KEY.
+
+Run from this directory:
+
+    python benchmark_edit_output.py --input my_text.txt --runs 3
+"""
+
+import argparse
+import os
+import statistics
+import time
+
+from langchain_openai import ChatOpenAI
+
+from app.main import prompt as rewrite_prompt
+from app.src.edit_operations import request_edits
+
+SAMPLE_PARAGRAPH = (
+    "Our team have been working on the new release for several month. "
+    "Most of the features was finished on time, but the documentation "
+    "still need some work before we can publish it. The testers reported "
+    "that the installer run smoothly on every platform we supports, and "
+    "the performance numbers looks better than the previous version. "
+    "We will announce the release date once the final review are done.\n\n"
+)
+
+
+def measure(function, runs):
+    latencies, output_tokens = [], []
+    for _ in range(runs):
+        start = time.perf_counter()
+        tokens = function()
+        latencies.append(time.perf_counter() - start)
+        output_tokens.append(tokens)
+    return statistics.median(latencies), statistics.median(output_tokens)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--input", help="Text file to correct.")
+    parser.add_argument(
+        "--paragraphs",
+        type=int,
+        default=10,
+        help="Copies of the built-in sample when --input is not given.",
+    )
+    parser.add_argument("--model", default="gpt-4o-mini")
+    parser.add_argument("--runs", type=int, default=3)
+    args = parser.parse_args()
+
+    if args.input:
+        with open(args.input, "r", encoding="utf-8") as input_file:
+            text = input_file.read()
+    else:
+        text = SAMPLE_PARAGRAPH * args.paragraphs
+
+    llm = ChatOpenAI(
+        model=args.model,
+        openai_api_key=os.environ["OPENAI_API_KEY"],
+        temperature=0,
+    )
+    rewrite_chain = rewrite_prompt | llm
+
+    def full_rewrite():
+        message = rewrite_chain.invoke({"user_input": text})
+        return message.usage_metadata["output_tokens"]
+
+    def edit_list():
+        _, _, _, usage = request_edits(text, llm)
+        return usage["output_tokens"]
+
+    print(f"{len(text.split())} words, {args.runs} runs each, {args.model}")
+    print(f"{'mode':<14} {'output tokens':>14} {'latency s':>10}")
+    results = {}
+    modes = [("full rewrite", full_rewrite), ("edit list", edit_list)]
+    for name, function in modes:
+        results[name] = measure(function, args.runs)
+        latency, tokens = results[name]
+        print(f"{name:<14} {tokens:>14.0f} {latency:>10.2f}")
+
+    rewrite_latency, rewrite_tokens = results["full rewrite"]
+    edit_latency, edit_tokens = results["edit list"]
+    print(
+        f"Edit list saves {1 - edit_tokens / rewrite_tokens:.0%} of output "
+        f"tokens and {1 - edit_latency / rewrite_latency:.0%} of latency."
+    )
+
+
+if __name__ == "__main__":
+    main()
@@ -1,20 +1,300 @@
 import os
+import time
+import uuid
 
 import streamlit as st
 from auto1111sdk import StableDiffusionPipeline
 
+from app.src.cpu_profile import (
+    ATTENTION_OPTIONS,
+    AUTOMATIC_ATTENTION,
+    CpuProfile,
+    default_threads,
+)
+from app.src.generation_queue import (
+    CANCELLED,
+    DONE,
+    FAILED,
+    RUNNING,
+    GenerationQueue,
+)
+from app.src.image_cache import ImageCache
+from app.src.pipeline_cache import PipelineCache
+from app.src.sweep import (
+    image_caption,
+    image_count,
+    matrix_variants,
+    parse_int_list,
+)
+
 st.set_page_config(page_title="Stable Diffusion Image Generator")
 
+# Specify the models directory
+models_dir = "./models/"
+
+# Memory budget for loaded pipelines and an optional model to keep loaded,
+# e.g. PIPELINE_CACHE_GB=12 DEFAULT_MODEL=realisticVision.safetensors
+PIPELINE_CACHE_GB = float(os.environ.get("PIPELINE_CACHE_GB", "8"))
+DEFAULT_MODEL = os.environ.get("DEFAULT_MODEL")
+
+# CPU inference settings, e.g. CPU_THREADS=8 ATTENTION="sub-quadratic".
+# Use benchmark_txt2img.py to find the fastest ones for a machine.
+CPU_THREADS = int(os.environ.get("CPU_THREADS", "0")) or None
+ATTENTION = os.environ.get("ATTENTION", AUTOMATIC_ATTENTION)
+LOW_MEMORY = os.environ.get("LOW_MEMORY", "") == "1"
+
+SINGLE_MODE = "Single image"
+BATCH_MODE = "Batch"
+MATRIX_MODE = "Prompt matrix"
+# Upper bound on the images one batch or matrix may queue.
+MAX_SWEEP_IMAGES = 64
+GRID_COLUMNS = 4
+
+SAMPLERS = [
+    "Euler a",
+    "Euler",
+    "LMS",
+    "Heun",
+    "DPM2",
+    "DPM2 a",
+    "DPM++ 2S a",
+    "DPM++ 2M",
+    "DPM fast",
+    "DPM adaptive",
+    "LMS Karras",
+    "DPM2 Karras",
+    "DPM2 a Karras",
+    "DPM++ 2S a Karras",
+    "DPM++ 2M Karras",
+    "DDIM",
+    "PLMS",
+]
+
+# Fixed-seed results are saved here and reused for identical settings.
+IMAGE_CACHE_DIR = os.environ.get("IMAGE_CACHE_DIR", "./image_cache/")
+IMAGE_CACHE_GB = float(os.environ.get("IMAGE_CACHE_GB", "2"))
+
 
 @st.cache_resource
-def load_model(model_path):
-    return StableDiffusionPipeline(model_path)
+def load_pipeline_cache():
+    pinned_model = (
+        os.path.join(models_dir, DEFAULT_MODEL) if DEFAULT_MODEL else None
+    )
+    return PipelineCache(
+        StableDiffusionPipeline,
+        int(PIPELINE_CACHE_GB * 1024**3),
+        pinned_model=pinned_model,
+    )
 
 
-st.title("Stable Diffusion Image Generator")
+@st.cache_resource
+def load_image_cache():
+    return ImageCache(IMAGE_CACHE_DIR, int(IMAGE_CACHE_GB * 1024**3))
 
-# Specify the models directory
-models_dir = "./models/"
+
+@st.cache_resource
+def load_cpu_profile():
+    return CpuProfile(CPU_THREADS, ATTENTION, LOW_MEMORY)
+
+
+@st.cache_resource
+def load_generation_queue():
+    return GenerationQueue(
+        load_pipeline_cache(), load_image_cache(), load_cpu_profile()
+    )
+
+
+def get_user_id():
+    """
+    Returns an id for the current user that survives reruns and browser
+    refreshes by keeping it in the page URL.
+
+    Returns:
+        str: The user id.
+    """
+    if "user" not in st.query_params:
+        st.query_params["user"] = uuid.uuid4().hex
+    return st.query_params["user"]
+
+
+def show_results(job):
+    """
+    Shows the images of a job: a single image at full width, several in a
+    grid captioned with their settings and generation time.
+
+    Args:
+        job (GenerationJob): The job.
+    """
+    if len(job.variants) == 1 and len(job.results) == 1:
+        st.image(
+            job.results[0].image,
+            caption="Generated Image",
+            use_column_width=True,
+        )
+        return
+
+    columns = st.columns(GRID_COLUMNS)
+    for index, result in enumerate(job.results):
+        caption = image_caption(result.params, result.offset)
+        timing = "cached" if result.from_cache else f"{result.seconds:.1f}s"
+        columns[index % GRID_COLUMNS].image(
+            result.image,
+            caption=f"{caption} · {timing}",
+            use_column_width=True,
+        )
+
+
+@st.fragment(run_every=2)
+def show_jobs(generation_queue, user_id):
+    """
+    Lists the user's generations with queue position, progress, results and
+    a cancel button. Refreshes itself every two seconds.
+
+    Args:
+        generation_queue (GenerationQueue): The shared generation queue.
+        user_id (str): The current user.
+    """
+    jobs = generation_queue.jobs_for(user_id)
+    if jobs:
+        st.subheader("Your Generations")
+    for job in jobs:
+        title = job.params["prompt"][:80]
+        total_images = image_count(job.variants)
+        with st.container(border=True):
+            if total_images > 1:
+                title = f"{total_images} images, {title}"
+            st.caption(f"#{job.job_id}: {title}")
+            show_results(job)
+            if job.status == DONE:
+                elapsed = job.finished_at - job.started_at
+                if job.from_cache:
+                    st.success("Loaded from the image cache.")
+                elif total_images > 1:
+                    st.success(
+                        f"{total_images} images generated in {elapsed:.1f}s "
+                        f"({elapsed / total_images:.1f}s per image)."
+                    )
+                else:
+                    st.success(
+                        f"Image generated successfully in {elapsed:.1f}s!"
+                    )
+            elif job.status == FAILED:
+                st.error(f"An error occurred: {job.error}")
+            elif job.status == CANCELLED:
+                st.info("Cancelled.")
+            else:
+                if job.status == RUNNING:
+                    elapsed = time.time() - job.started_at
+                    st.progress(
+                        generation_queue.progress(job) or 0.0,
+                        text=(
+                            f"Generating... {len(job.results)} of "
+                            f"{total_images} done, {elapsed:.0f}s"
+                        ),
+                    )
+                else:
+                    ahead = generation_queue.position(job.job_id)
+                    st.write(f"Queued, {ahead} generation(s) ahead.")
+                if st.button("Cancel", key=f"cancel_{job.job_id}"):
+                    generation_queue.cancel(job.job_id)
+
+
+def show_cache_sidebar(pipeline_cache):
+    """
+    Shows the memory budget control and the loaded models in the sidebar.
+
+    Args:
+        pipeline_cache (PipelineCache): The shared pipeline cache.
+    """
+    st.sidebar.title("Model Cache")
+    budget_gb = st.sidebar.number_input(
+        "Memory budget (GB)",
+        min_value=1.0,
+        value=pipeline_cache.max_bytes / 1024**3,
+        step=0.5,
+    )
+    pipeline_cache.max_bytes = int(budget_gb * 1024**3)
+
+    stats = pipeline_cache.stats()
+    st.sidebar.progress(
+        min(stats["rss"] / stats["max_bytes"], 1.0),
+        text=(
+            f"Process memory: {stats['rss'] / 1024**3:.1f} GB of "
+            f"{stats['max_bytes'] / 1024**3:.1f} GB"
+        ),
+    )
+    for entry in reversed(stats["entries"]):
+        pinned = " (pinned)" if entry["pinned"] else ""
+        st.sidebar.write(
+            f"{entry['model']}{pinned}: {entry['footprint'] / 1024**3:.1f} GB"
+        )
+    if stats["lingering"]:
+        st.sidebar.caption(
+            "Unloaded but still in use, so not yet freed: "
+            + ", ".join(stats["lingering"])
+        )
+    if st.sidebar.button("Unload cached models"):
+        pipeline_cache.clear()
+        st.rerun()
+
+
+def show_cpu_profile_sidebar(cpu_profile):
+    """
+    Shows the CPU inference settings in the sidebar. Changes apply from the
+    next generation on.
+
+    Args:
+        cpu_profile (CpuProfile): The shared CPU profile.
+    """
+    st.sidebar.title("CPU Profile")
+    cpu_profile.threads = st.sidebar.number_input(
+        "Threads",
+        min_value=1,
+        max_value=default_threads(),
+        value=min(cpu_profile.threads, default_threads()),
+    )
+    cpu_profile.attention = st.sidebar.selectbox(
+        "Attention",
+        ATTENTION_OPTIONS,
+        index=ATTENTION_OPTIONS.index(cpu_profile.attention),
+        disabled=cpu_profile.low_memory,
+    )
+    cpu_profile.low_memory = st.sidebar.checkbox(
+        "Low memory",
+        value=cpu_profile.low_memory,
+        help="Chunked sub-quadratic attention: lower peak memory, slower.",
+    )
+
+
+def show_image_cache_sidebar(image_cache):
+    """
+    Shows the size of the on-disk image cache in the sidebar.
+
+    Args:
+        image_cache (ImageCache): The shared image cache.
+    """
+    st.sidebar.title("Image Cache")
+    stats = image_cache.stats()
+    st.sidebar.progress(
+        min(stats["bytes"] / stats["max_bytes"], 1.0),
+        text=(
+            f"{stats['entries']} result(s), "
+            f"{stats['bytes'] / 1024**2:.0f} MB of "
+            f"{stats['max_bytes'] / 1024**2:.0f} MB"
+        ),
+    )
+    if st.sidebar.button("Clear image cache"):
+        image_cache.clear()
+        st.rerun()
+
+
+pipeline_cache = load_pipeline_cache()
+cpu_profile = load_cpu_profile()
+image_cache = load_image_cache()
+generation_queue = load_generation_queue()
+user_id = get_user_id()
+
+st.title("Stable Diffusion Image Generator")
 
 # Get a list of all files in the models directory
 model_files = [
@@ -28,9 +308,6 @@ if model_files:
     selected_model = st.selectbox("Select a model to use", model_files)
     model_path = os.path.join(models_dir, selected_model)
 
-    # Load the selected model
-    pipe = load_model(model_path)
-
     positive_prompt = st.text_area(
         "Positive Prompt",
         value=(
@@ -65,28 +342,7 @@ if model_files:
         ),
     )
 
-    sampler_name = st.selectbox(
-        "Select Sampler",
-        [
-            "Euler a",
-            "Euler",
-            "LMS",
-            "Heun",
-            "DPM2",
-            "DPM2 a",
-            "DPM++ 2S a",
-            "DPM++ 2M",
-            "DPM fast",
-            "DPM adaptive",
-            "LMS Karras",
-            "DPM2 Karras",
-            "DPM2 a Karras",
-            "DPM++ 2S a Karras",
-            "DPM++ 2M Karras",
-            "DDIM",
-            "PLMS",
-        ],
-    )
+    sampler_name = st.selectbox("Select Sampler", SAMPLERS)
 
     seed = st.number_input(
         "Seed (-1 for random)",
@@ -122,28 +378,81 @@ if model_files:
         step=0.1,
     )
 
-    if st.button("Generate Image"):
-        with st.spinner("Generating image..."):
-            try:
-                output = pipe.generate_txt2img(
-                    prompt=positive_prompt,
-                    negative_prompt=negative_prompt,
-                    sampler_name=sampler_name,
-                    seed=seed,
-                    steps=steps,
-                    height=height,
-                    width=width,
-                    cfg_scale=cfg_scale,
-                )
-
-                st.image(
-                    output[0],
-                    caption="Generated Image",
-                    use_column_width=True,
-                )
-
-                st.success("Image generated successfully!")
-            except Exception as e:
-                st.error(f"An error occurred: {e}")
+    mode = st.radio(
+        "Mode",
+        [SINGLE_MODE, BATCH_MODE, MATRIX_MODE],
+        horizontal=True,
+        help=(
+            "Batch generates several images from consecutive seeds in one "
+            "call. Prompt matrix generates every combination of the listed "
+            "prompts, seeds, samplers and step counts."
+        ),
+    )
+    params = {
+        "prompt": positive_prompt,
+        "negative_prompt": negative_prompt,
+        "sampler_name": sampler_name,
+        "seed": seed,
+        "steps": steps,
+        "height": height,
+        "width": width,
+        "cfg_scale": cfg_scale,
+    }
+    variants = [params]
+    if mode == BATCH_MODE:
+        num_images = st.number_input(
+            "Images per prompt",
+            min_value=2,
+            max_value=MAX_SWEEP_IMAGES,
+            value=4,
+        )
+        variants = [dict(params, num_images=num_images)]
+    elif mode == MATRIX_MODE:
+        extra_prompts = st.text_area(
+            "Additional prompts (one per line)",
+            help=(
+                "Each line is combined with every seed, sampler and step "
+                "count."
+            ),
+        )
+        seeds_text = st.text_input("Seeds (e.g. 1, 2, 10-13)", value="1-4")
+        matrix_samplers = st.multiselect(
+            "Samplers", SAMPLERS, default=[sampler_name]
+        )
+        steps_text = st.text_input(
+            "Step counts (e.g. 20, 30)", value=str(steps)
+        )
+        prompts = [positive_prompt] + [
+            line.strip() for line in extra_prompts.splitlines() if line.strip()
+        ]
+        try:
+            variants = matrix_variants(
+                params,
+                prompts,
+                parse_int_list(seeds_text),
+                matrix_samplers,
+                parse_int_list(steps_text),
+            )
+        except ValueError:
+            st.error("Seeds and step counts must be numbers or ranges.")
+            variants = []
+
+    total_images = image_count(variants)
+    if mode != SINGLE_MODE:
+        st.caption(
+            f"{total_images} image(s) in {len(variants)} pipeline call(s)."
+        )
+    if total_images > MAX_SWEEP_IMAGES:
+        st.warning(f"At most {MAX_SWEEP_IMAGES} images can be queued at once.")
+
+    generate_disabled = not variants or total_images > MAX_SWEEP_IMAGES
+    if st.button("Generate Image", disabled=generate_disabled):
+        generation_queue.submit_sweep(user_id, model_path, variants)
+
+    show_jobs(generation_queue, user_id)
 else:
     st.warning("No model files found in the specified directory.")
+
+show_cache_sidebar(pipeline_cache)
+show_cpu_profile_sidebar(cpu_profile)
+show_image_cache_sidebar(image_cache)
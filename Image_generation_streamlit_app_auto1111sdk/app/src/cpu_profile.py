@@ -0,0 +1,98 @@
+import os
+import threading
+
+AUTOMATIC_ATTENTION = "Automatic"
+# Cross-attention implementations the SDK offers that run on CPU, by the
+# title it knows them under.
+ATTENTION_OPTIONS = [
+    AUTOMATIC_ATTENTION,
+    "sdp - scaled dot product",
+    "sub-quadratic",
+    "Doggettx",
+    "V1 - original v1",
+    "InvokeAI",
+    "None",
+]
+LOW_MEMORY_ATTENTION = "sub-quadratic"
+# Query and key/value chunk sizes of the sub-quadratic attention in low
+# memory mode. Smaller chunks lower peak memory at some cost in speed.
+LOW_MEMORY_CHUNK_SIZE = 256
+
+
+def default_threads():
+    """
+    Returns the number of CPU cores this process may run on.
+    """
+    try:
+        return len(os.sched_getaffinity(0))
+    except AttributeError:
+        return os.cpu_count() or 1
+
+
+class CpuProfile:
+    """
+    Inference settings for CPU-only machines: the number of threads torch
+    uses and the cross-attention implementation. The SDK reads its command
+    line options once per process, so the settings are applied at runtime
+    instead, right before each generation on the thread that runs it.
+    """
+
+    def __init__(self,
+                 threads=None,
+                 attention=AUTOMATIC_ATTENTION,
+                 low_memory=False):
+        """
+        Args:
+            threads (int, optional): Threads for torch; defaults to every
+                                     available core.
+            attention (str): One of ``ATTENTION_OPTIONS``.
+            low_memory (bool): Use chunked sub-quadratic attention to lower
+                               peak memory, overriding ``attention``.
+        """
+        if attention not in ATTENTION_OPTIONS:
+            raise ValueError(f"Unknown attention option: {attention}")
+        self.threads = threads or default_threads()
+        self.attention = attention
+        self.low_memory = low_memory
+        self._applied = None
+        self._lock = threading.Lock()
+
+    @property
+    def effective_attention(self):
+        return LOW_MEMORY_ATTENTION if self.low_memory else self.attention
+
+    def settings(self):
+        """
+        Describes the profile, e.g. for a benchmark report.
+
+        Returns:
+            dict: ``threads``, ``attention`` and ``low_memory``.
+        """
+        return {
+            "threads": self.threads,
+            "attention": self.effective_attention,
+            "low_memory": self.low_memory,
+        }
+
+    def apply(self):
+        """
+        Applies the profile if it changed since it was last applied. Must be
+        called after a pipeline has been created, since that is when the SDK
+        registers its attention implementations.
+        """
+        wanted = (self.threads, self.effective_attention, self.low_memory)
+        with self._lock:
+            if wanted == self._applied:
+                return
+            import torch
+            from auto1111sdk.modules import sd_hijack, shared
+
+            torch.set_num_threads(self.threads)
+            chunk_size = LOW_MEMORY_CHUNK_SIZE if self.low_memory else None
+            shared.cmd_opts.sub_quad_q_chunk_size = chunk_size or 1024
+            shared.cmd_opts.sub_quad_kv_chunk_size = chunk_size
+            # Stored in the options too, so that the SDK keeps the choice
+            # when it re-applies optimizations after loading another model.
+            shared.opts.data["cross_attention_optimization"] = wanted[1]
+            sd_hijack.apply_optimizations(wanted[1])
+            self._applied = wanted
@@ -0,0 +1,385 @@
+import itertools
+import threading
+import time
+from collections import OrderedDict, deque, namedtuple
+
+QUEUED = "queued"
+RUNNING = "running"
+DONE = "done"
+FAILED = "failed"
+CANCELLED = "cancelled"
+FINISHED = (DONE, FAILED, CANCELLED)
+
+# One image of a job: the call that produced it, its index within that
+# call, the generation time attributed to it (the call's time split evenly
+# over its images) and whether it came from the image cache.
+GeneratedImage = namedtuple(
+    "GeneratedImage", ["image", "params", "offset", "seconds", "from_cache"]
+)
+
+
+def work_units(params):
+    # Sampling time grows with steps times images.
+    return params.get("steps", 20) * params.get("num_images", 1)
+
+
+class GenerationJob:
+    """
+    A txt2img request, made of one or more pipeline calls, and its outcome.
+    """
+
+    def __init__(self, job_id, user_id, model_path, variants):
+        self.job_id = job_id
+        self.user_id = user_id
+        self.model_path = model_path
+        self.variants = variants
+        self.status = QUEUED
+        self.results = []
+        self.error = None
+        self.submitted_at = time.time()
+        self.started_at = None
+        self.finished_at = None
+        self.cancel_requested = False
+        self.cache_keys = [None] * len(variants)
+        # Index of the next call to run and when the current one started.
+        self.next_variant = 0
+        self.variant_started_at = None
+
+    @property
+    def params(self):
+        return self.variants[0]
+
+    @property
+    def from_cache(self):
+        return bool(self.results) and all(
+            result.from_cache for result in self.results
+        )
+
+
+class GenerationQueue:
+    """
+    Runs txt2img jobs on a dedicated worker thread that owns all pipeline
+    work, so concurrent users do not compete for the same CPU cores. Users
+    are served round-robin one pipeline call at a time, so one user queueing
+    a large sweep does not hold up everyone else.
+    """
+
+    def __init__(self,
+                 pipeline_cache,
+                 image_cache=None,
+                 cpu_profile=None,
+                 keep_per_user=20,
+                 keep_total=200,
+                 keep_seconds=3600):
+        """
+        Args:
+            pipeline_cache (PipelineCache): Where the worker gets pipelines.
+            image_cache (ImageCache, optional): Where results of fixed-seed
+                                                generations are saved and
+                                                looked up.
+            cpu_profile (CpuProfile, optional): Inference settings applied
+                                                before each pipeline call.
+            keep_per_user (int): Finished jobs kept per user for display.
+            keep_total (int): Finished jobs kept across all users. Every
+                              browser tab is a new user, so without this
+                              limit abandoned tabs would keep their images
+                              in memory forever.
+            keep_seconds (float): Finished jobs are forgotten this long
+                                  after they finish.
+        """
+        self.pipeline_cache = pipeline_cache
+        self.image_cache = image_cache
+        self.cpu_profile = cpu_profile
+        self.keep_per_user = keep_per_user
+        self.keep_total = keep_total
+        self.keep_seconds = keep_seconds
+        self._jobs = {}
+        self._user_jobs = {}
+        self._pending = OrderedDict()
+        self._ids = itertools.count(1)
+        self._condition = threading.Condition()
+        self._seconds_per_unit = None
+        self._busy = False
+        self._worker = threading.Thread(
+            target=self._run, name="generation-worker", daemon=True
+        )
+        self._worker.start()
+
+    def submit(self, user_id, model_path, params):
+        """
+        Queues a single generation.
+
+        Args:
+            user_id (str): Identifies the user for fair scheduling.
+            model_path (str): Path of the model checkpoint to use.
+            params (dict): Keyword arguments for ``generate_txt2img``.
+
+        Returns:
+            int: The job id.
+        """
+        return self.submit_sweep(user_id, model_path, [params])
+
+    def submit_sweep(self, user_id, model_path, variants):
+        """
+        Queues a job that makes several pipeline calls with the same model.
+        If the image cache already holds the results of every call, the job
+        is completed right away without queueing.
+
+        Args:
+            user_id (str): Identifies the user for fair scheduling.
+            model_path (str): Path of the model checkpoint to use.
+            variants (List[dict]): Keyword arguments for each
+                                   ``generate_txt2img`` call.
+
+        Returns:
+            int: The job id.
+        """
+        cache_keys = [None] * len(variants)
+        cached = [None] * len(variants)
+        if self.image_cache is not None:
+            for index, params in enumerate(variants):
+                # Hashing a model seen for the first time takes a while, so
+                # that is left to the worker rather than freezing the page.
+                cache_keys[index] = self.image_cache.key(
+                    model_path, params, hash_model=False
+                )
+                cached[index] = self.image_cache.get(cache_keys[index])
+
+        with self._condition:
+            job = GenerationJob(next(self._ids), user_id, model_path, variants)
+            job.cache_keys = cache_keys
+            self._jobs[job.job_id] = job
+            self._user_jobs.setdefault(user_id, []).append(job.job_id)
+            if all(images is not None for images in cached):
+                for params, images in zip(variants, cached):
+                    self._add_results(job, params, images, 0.0, True)
+                job.next_variant = len(variants)
+                job.status = DONE
+                job.started_at = job.finished_at = time.time()
+            else:
+                self._pending.setdefault(user_id, deque()).append(job)
+                self._condition.notify()
+            self._forget_old_jobs()
+            return job.job_id
+
+    def cancel(self, job_id):
+        """
+        Cancels a job. Calls that have not started are skipped; a running
+        call is allowed to finish and its images are kept.
+
+        Args:
+            job_id (int): The job to cancel.
+        """
+        with self._condition:
+            job = self._jobs.get(job_id)
+            if job is None or job.status not in (QUEUED, RUNNING):
+                return
+            job.cancel_requested = True
+            queue = self._pending.get(job.user_id)
+            if queue is not None and job in queue:
+                queue.remove(job)
+                if not queue:
+                    del self._pending[job.user_id]
+                job.status = CANCELLED
+                job.finished_at = time.time()
+
+    def jobs_for(self, user_id):
+        """
+        Returns the user's jobs, newest first.
+
+        Args:
+            user_id (str): The user.
+
+        Returns:
+            List[GenerationJob]: The jobs still kept for this user.
+        """
+        with self._condition:
+            return [
+                self._jobs[job_id]
+                for job_id in reversed(self._user_jobs.get(user_id, []))
+                if job_id in self._jobs
+            ]
+
+    def position(self, job_id):
+        """
+        Estimates how many pipeline calls will run before a queued job
+        starts under round-robin scheduling.
+
+        Args:
+            job_id (int): The job.
+
+        Returns:
+            int: Calls ahead of it, or None if it is no longer queued.
+        """
+        with self._condition:
+            job = self._jobs.get(job_id)
+            if job is None or job.status != QUEUED:
+                return None
+            # Jobs ahead of ours in the same user's queue run to completion
+            # first, one call per round.
+            own_queue = self._pending[job.user_id]
+            rank = sum(
+                len(queued.variants) - queued.next_variant
+                for queued in itertools.islice(own_queue, own_queue.index(job))
+            )
+            ahead = 0
+            before_in_rotation = True
+            for user_id, queue in self._pending.items():
+                if user_id == job.user_id:
+                    before_in_rotation = False
+                    ahead += rank
+                    continue
+                calls = sum(
+                    len(queued.variants) - queued.next_variant
+                    for queued in queue
+                )
+                # Every other user gets one call per round; users ahead in
+                # the rotation also get one in the job's own round.
+                ahead += min(calls, rank + before_in_rotation)
+            if self._busy:
+                ahead += 1
+            return ahead
+
+    def progress(self, job):
+        """
+        Estimates the progress of a running job from its finished calls and
+        the measured average time per sampling step.
+
+        Args:
+            job (GenerationJob): A running job.
+
+        Returns:
+            float: A value between 0 and 1, or None before any call finished.
+        """
+        if job.status != RUNNING or not self._seconds_per_unit:
+            return None
+        total = sum(work_units(params) for params in job.variants)
+        done = sum(
+            work_units(params) for params in job.variants[: job.next_variant]
+        )
+        started_at = job.variant_started_at
+        if started_at is not None:
+            current = job.variants[job.next_variant]
+            elapsed = time.time() - started_at
+            done += min(elapsed / self._seconds_per_unit, work_units(current))
+        return min(done / total, 0.99)
+
+    def _add_results(self, job, params, images, seconds, from_cache):
+        per_image = seconds / max(len(images), 1)
+        for offset, image in enumerate(images):
+            job.results.append(
+                GeneratedImage(image, params, offset, per_image, from_cache)
+            )
+
+    def _forget_old_jobs(self):
+        # Keep the newest finished jobs within the age, per-user and total
+        # limits; the rest are dropped along with their images.
+        now = time.time()
+        finished = sorted(
+            (job for job in self._jobs.values() if job.status in FINISHED),
+            key=lambda job: job.finished_at,
+            reverse=True,
+        )
+        kept_per_user = {}
+        kept = 0
+        for job in finished:
+            user_kept = kept_per_user.get(job.user_id, 0)
+            if (
+                now - job.finished_at <= self.keep_seconds
+                and user_kept < self.keep_per_user
+                and kept < self.keep_total
+            ):
+                kept_per_user[job.user_id] = user_kept + 1
+                kept += 1
+                continue
+            del self._jobs[job.job_id]
+            user_jobs = self._user_jobs[job.user_id]
+            user_jobs.remove(job.job_id)
+            if not user_jobs:
+                del self._user_jobs[job.user_id]
+
+    def _next_job(self):
+        # Take the head of the first user's queue, then move that user to
+        # the back of the rotation.
+        user_id, queue = next(iter(self._pending.items()))
+        job = queue.popleft()
+        del self._pending[user_id]
+        if queue:
+            self._pending[user_id] = queue
+        return job
+
+    def _generate(self, job, index):
+        # Answered on submit, or filled by an identical call since then.
+        if self.image_cache is not None:
+            if job.cache_keys[index] is None:
+                job.cache_keys[index] = self.image_cache.key(
+                    job.model_path, job.variants[index]
+                )
+            cached = self.image_cache.get(job.cache_keys[index])
+            if cached is not None:
+                return cached, True
+        # The pipeline cache keeps the model loaded between the calls of a
+        # sweep, so only the first call pays for loading it.
+        pipeline = self.pipeline_cache.get(job.model_path)
+        if self.cpu_profile is not None:
+            self.cpu_profile.apply()
+        images = pipeline.generate_txt2img(**job.variants[index])
+        if self.image_cache is not None:
+            self.image_cache.put(job.cache_keys[index], images)
+        return images, False
+
+    def _run(self):
+        while True:
+            with self._condition:
+                self._forget_old_jobs()
+                while not self._pending:
+                    self._condition.wait()
+                job = self._next_job()
+                index = job.next_variant
+                if job.status == QUEUED:
+                    job.status = RUNNING
+                    job.started_at = time.time()
+                job.variant_started_at = time.time()
+                self._busy = True
+
+            try:
+                images, from_cache = self._generate(job, index)
+                error = None
+            except Exception as e:
+                images, from_cache, error = None, False, e
+            finished_at = time.time()
+
+            with self._condition:
+                self._busy = False
+                seconds = finished_at - job.variant_started_at
+                job.variant_started_at = None
+                job.next_variant = index + 1
+                if error is not None:
+                    job.status = FAILED
+                    job.error = str(error)
+                    job.finished_at = finished_at
+                    continue
+
+                params = job.variants[index]
+                self._add_results(job, params, images, seconds, from_cache)
+                if not from_cache:
+                    seconds_per_unit = seconds / max(work_units(params), 1)
+                    self._seconds_per_unit = (
+                        seconds_per_unit
+                        if self._seconds_per_unit is None
+                        else 0.7 * self._seconds_per_unit
+                        + 0.3 * seconds_per_unit
+                    )
+
+                if job.cancel_requested:
+                    job.status = CANCELLED
+                    job.finished_at = finished_at
+                elif job.next_variant == len(job.variants):
+                    job.status = DONE
+                    job.finished_at = finished_at
+                else:
+                    # Put the rest of the sweep back at the head of this
+                    # user's queue; the user has already moved to the back
+                    # of the rotation.
+                    queue = self._pending.setdefault(job.user_id, deque())
+                    queue.appendleft(job)
@@ -0,0 +1,271 @@
+import hashlib
+import io
+import json
+import os
+import shutil
+import tempfile
+import threading
+import time
+
+# Generation parameters that, together with the model file, a fixed seed
+# and the number of images, fully determine a txt2img result.
+KEY_PARAMS = (
+    "prompt",
+    "negative_prompt",
+    "sampler_name",
+    "seed",
+    "steps",
+    "height",
+    "width",
+    "cfg_scale",
+)
+# Entries are written to a staging directory and then renamed into place.
+STAGING_PREFIX = ".staging-"
+# Staging directories older than this are left over from a crash rather
+# than being written by another process sharing the cache.
+STAGING_GRACE_SECONDS = 3600
+
+
+def file_hash(path, chunk_size=1024 * 1024):
+    """
+    Computes the SHA-256 digest of a file without reading it into memory.
+
+    Args:
+        path (str): The file to hash.
+        chunk_size (int): Bytes read at a time.
+
+    Returns:
+        str: The hex digest.
+    """
+    digest = hashlib.sha256()
+    with open(path, "rb") as model_file:
+        for chunk in iter(lambda: model_file.read(chunk_size), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+class ImageCache:
+    """
+    Stores txt2img results on disk under a key derived from the model file
+    contents and the generation parameters, so that repeating a generation
+    with a fixed seed returns the saved PNGs without touching the pipeline.
+    The least recently used entries are deleted once the cache grows past
+    its size limit.
+    """
+
+    def __init__(self, cache_dir, max_bytes):
+        """
+        Args:
+            cache_dir (str): Directory holding one subdirectory per entry.
+            max_bytes (int): Upper bound on the total size of cached PNGs.
+        """
+        self.cache_dir = cache_dir
+        self.max_bytes = max_bytes
+        self._lock = threading.Lock()
+        self._model_hashes_path = os.path.join(cache_dir, "model_hashes.json")
+        os.makedirs(cache_dir, exist_ok=True)
+        self._model_hashes = self._load_model_hashes()
+        # key -> (size in bytes, last used), rebuilt from disk on startup.
+        self._entries = {}
+        for key in os.listdir(cache_dir):
+            entry_dir = os.path.join(cache_dir, key)
+            if key.startswith(STAGING_PREFIX):
+                self._remove_stale_staging(entry_dir)
+            elif os.path.isdir(entry_dir) and not key.startswith("."):
+                self._entries[key] = (
+                    self._directory_size(entry_dir),
+                    os.path.getmtime(entry_dir),
+                )
+
+    @staticmethod
+    def _remove_stale_staging(path):
+        try:
+            age = time.time() - os.path.getmtime(path)
+        except OSError:
+            return
+        if age > STAGING_GRACE_SECONDS:
+            shutil.rmtree(path, ignore_errors=True)
+
+    def _load_model_hashes(self):
+        try:
+            with open(self._model_hashes_path, "r") as hashes_file:
+                return json.load(hashes_file)
+        except (OSError, ValueError):
+            return {}
+
+    @staticmethod
+    def _directory_size(path):
+        return sum(
+            os.path.getsize(os.path.join(path, name))
+            for name in os.listdir(path)
+        )
+
+    def model_hash(self, model_path, compute=True):
+        """
+        Returns the content hash of a model file. Hashing a checkpoint takes
+        several seconds, so the result is remembered on disk for as long as
+        the file's size and modification time do not change.
+
+        Args:
+            model_path (str): Path of the model checkpoint.
+            compute (bool): Whether to hash the file when its hash is not
+                            remembered yet.
+
+        Returns:
+            str: The hex digest of the file, or None if it is not known and
+                 ``compute`` is False.
+        """
+        stat = os.stat(model_path)
+        signature = f"{stat.st_size}:{stat.st_mtime_ns}"
+        path = os.path.abspath(model_path)
+        with self._lock:
+            known = self._model_hashes.get(path)
+        if known and known["signature"] == signature:
+            return known["sha256"]
+        if not compute:
+            return None
+
+        digest = file_hash(model_path)
+        with self._lock:
+            self._model_hashes[path] = {
+                "signature": signature,
+                "sha256": digest,
+            }
+            with open(self._model_hashes_path, "w") as hashes_file:
+                json.dump(self._model_hashes, hashes_file)
+        return digest
+
+    def key(self, model_path, params, hash_model=True):
+        """
+        Builds the cache key of a generation.
+
+        Args:
+            model_path (str): Path of the model checkpoint.
+            params (dict): Keyword arguments for ``generate_txt2img``.
+            hash_model (bool): Whether to hash the model file if its hash is
+                               not remembered yet. Pass False on the
+                               Streamlit thread, which must not wait for it.
+
+        Returns:
+            str: The key, or None if the result is not reproducible because
+                 the seed is random, or the model hash is not known and
+                 ``hash_model`` is False.
+        """
+        if params.get("seed", -1) == -1:
+            return None
+        model = self.model_hash(model_path, compute=hash_model)
+        if model is None:
+            return None
+        described = {name: params.get(name) for name in KEY_PARAMS}
+        described["num_images"] = params.get("num_images", 1)
+        described["model"] = model
+        encoded = json.dumps(described, sort_keys=True).encode("utf-8")
+        return hashlib.sha256(encoded).hexdigest()
+
+    def get(self, key):
+        """
+        Looks up a cached result.
+
+        Args:
+            key (str): A key from ``key``.
+
+        Returns:
+            List[bytes]: The PNG data of each image, or None on a miss.
+        """
+        if key is None:
+            return None
+        entry_dir = os.path.join(self.cache_dir, key)
+        with self._lock:
+            if key not in self._entries:
+                return None
+            try:
+                names = sorted(
+                    os.listdir(entry_dir), key=lambda name: int(name[:-4])
+                )
+                images = []
+                for name in names:
+                    with open(os.path.join(entry_dir, name), "rb") as png:
+                        images.append(png.read())
+            except OSError:
+                # Deleted behind our back; treat as a miss.
+                self._entries.pop(key, None)
+                return None
+            now = time.time()
+            os.utime(entry_dir, (now, now))
+            self._entries[key] = (self._entries[key][0], now)
+        return images
+
+    def put(self, key, images):
+        """
+        Saves a result as PNG files and evicts old entries if the cache is
+        over its size limit.
+
+        Args:
+            key (str): A key from ``key``.
+            images (List[PIL.Image.Image]): The generated images.
+        """
+        if key is None or not images:
+            return
+        # Write to a temporary directory first so that a crash never leaves
+        # a partial entry behind.
+        staging_dir = tempfile.mkdtemp(
+            prefix=STAGING_PREFIX, dir=self.cache_dir
+        )
+        try:
+            for index, image in enumerate(images):
+                buffer = io.BytesIO()
+                image.save(buffer, format="PNG")
+                png_path = os.path.join(staging_dir, f"{index}.png")
+                with open(png_path, "wb") as png:
+                    png.write(buffer.getbuffer())
+        except BaseException:
+            shutil.rmtree(staging_dir, ignore_errors=True)
+            raise
+        size = self._directory_size(staging_dir)
+
+        entry_dir = os.path.join(self.cache_dir, key)
+        with self._lock:
+            if key in self._entries:
+                shutil.rmtree(staging_dir, ignore_errors=True)
+                return
+            os.replace(staging_dir, entry_dir)
+            self._entries[key] = (size, time.time())
+            self._evict(keep=key)
+
+    def _evict(self, keep):
+        total = sum(size for size, _ in self._entries.values())
+        by_age = sorted(self._entries.items(), key=lambda item: item[1][1])
+        for key, (size, _) in by_age:
+            if total <= self.max_bytes:
+                break
+            if key == keep:
+                continue
+            entry_dir = os.path.join(self.cache_dir, key)
+            shutil.rmtree(entry_dir, ignore_errors=True)
+            del self._entries[key]
+            total -= size
+
+    def clear(self):
+        """
+        Deletes every cached result.
+        """
+        with self._lock:
+            for key in list(self._entries):
+                shutil.rmtree(
+                    os.path.join(self.cache_dir, key), ignore_errors=True
+                )
+            self._entries.clear()
+
+    def stats(self):
+        """
+        Describes the cache for display.
+
+        Returns:
+            dict: ``entries``, ``bytes`` and ``max_bytes``.
+        """
+        with self._lock:
+            return {
+                "entries": len(self._entries),
+                "bytes": sum(size for size, _ in self._entries.values()),
+                "max_bytes": self.max_bytes,
+            }
@@ -0,0 +1,202 @@
+import ctypes
+import gc
+import os
+import threading
+import time
+import weakref
+from collections import OrderedDict
+
+import psutil
+
+
+def current_rss():
+    """
+    Returns the resident set size of this process in bytes.
+    """
+    return psutil.Process().memory_info().rss
+
+
+def release_memory():
+    """
+    Runs the garbage collector and asks the allocator to hand freed pages
+    back to the operating system so that RSS actually drops.
+    """
+    gc.collect()
+    try:
+        import torch
+
+        if torch.cuda.is_available():
+            torch.cuda.empty_cache()
+    except ImportError:
+        pass
+    try:
+        ctypes.CDLL("libc.so.6").malloc_trim(0)
+    except (OSError, AttributeError):
+        # Not glibc; the memory is still reusable by this process.
+        pass
+
+
+class PipelineCache:
+    """
+    Keeps loaded Stable Diffusion pipelines within a memory budget, evicting
+    the least recently used ones when a new model would not fit.
+    """
+
+    def __init__(self, loader, max_bytes, pinned_model=None):
+        """
+        Args:
+            loader (callable): Loads a pipeline from a model path.
+            max_bytes (int): Process RSS budget in bytes.
+            pinned_model (str, optional): Path of a model that is loaded
+                                          right away and never evicted.
+        """
+        self.loader = loader
+        self.max_bytes = max_bytes
+        self.pinned_model = pinned_model
+        self._pipelines = OrderedDict()
+        self._footprints = {}
+        self._last_used = {}
+        # Evicted pipelines that something else still references, so their
+        # memory has not actually been freed.
+        self._lingering = {}
+        # model path -> Event set once a load in progress has finished.
+        self._loading = {}
+        self._lock = threading.RLock()
+        if pinned_model:
+            self.get(pinned_model)
+
+    def _estimate_footprint(self, model_path):
+        # The weights dominate, so the checkpoint size is a good first guess
+        # until the model has been loaded once and measured.
+        return self._footprints.get(model_path, os.path.getsize(model_path))
+
+    def _evict(self, model_path):
+        pipeline = self._pipelines.pop(model_path)
+        self._last_used.pop(model_path, None)
+        reference = weakref.ref(pipeline)
+        # Only the cache's reference can be dropped here; the model is
+        # freed once nothing else holds it.
+        del pipeline
+        release_memory()
+        if reference() is not None:
+            self._lingering[model_path] = reference
+
+    def _lingering_models(self):
+        for model_path, reference in list(self._lingering.items()):
+            if reference() is None:
+                del self._lingering[model_path]
+        return list(self._lingering)
+
+    def _make_room(self, needed):
+        for model_path in list(self._pipelines):
+            if current_rss() + needed <= self.max_bytes:
+                return
+            if model_path != self.pinned_model:
+                self._evict(model_path)
+
+    def get(self, model_path):
+        """
+        Returns the pipeline for ``model_path``, loading it if necessary.
+        Callers should not keep the pipeline once they are done with it:
+        the cache can only free a model when it holds the last reference.
+
+        Args:
+            model_path (str): Path of the model checkpoint.
+
+        Returns:
+            StableDiffusionPipeline: The loaded pipeline.
+        """
+        while True:
+            with self._lock:
+                if model_path in self._pipelines:
+                    self._pipelines.move_to_end(model_path)
+                    self._last_used[model_path] = time.time()
+                    return self._pipelines[model_path]
+
+                # An evicted model that is still referenced elsewhere is
+                # still in memory; take it back rather than loading a second
+                # copy.
+                reference = self._lingering.pop(model_path, None)
+                pipeline = reference() if reference is not None else None
+                if pipeline is not None:
+                    self._pipelines[model_path] = pipeline
+                    self._last_used[model_path] = time.time()
+                    return pipeline
+
+                loaded = self._loading.get(model_path)
+                if loaded is None:
+                    # Claim the load; later callers wait for it below.
+                    loaded = self._loading[model_path] = threading.Event()
+                    self._make_room(self._estimate_footprint(model_path))
+                    break
+            # Another thread is loading this model. Check again once it is
+            # done, and take over the load if that one failed.
+            loaded.wait()
+
+        # Loading takes minutes on CPU, so it runs without the lock and
+        # stats() and clear() stay responsive meanwhile.
+        try:
+            rss_before = current_rss()
+            pipeline = self.loader(model_path)
+            footprint = max(current_rss() - rss_before, 0)
+        except BaseException:
+            with self._lock:
+                del self._loading[model_path]
+            loaded.set()
+            raise
+
+        with self._lock:
+            self._footprints[model_path] = footprint
+            self._pipelines[model_path] = pipeline
+            self._last_used[model_path] = time.time()
+            del self._loading[model_path]
+            # The estimate may have been too low; trim again now that the
+            # real footprint is known, keeping the model just loaded.
+            self._pipelines.move_to_end(model_path)
+            for cached_path in list(self._pipelines)[:-1]:
+                if current_rss() <= self.max_bytes:
+                    break
+                if cached_path != self.pinned_model:
+                    self._evict(cached_path)
+        loaded.set()
+        return pipeline
+
+    def clear(self):
+        """
+        Evicts every pipeline except the pinned one.
+        """
+        with self._lock:
+            for model_path in list(self._pipelines):
+                if model_path != self.pinned_model:
+                    self._evict(model_path)
+
+    def stats(self):
+        """
+        Describes the cache contents for display.
+
+        Returns:
+            dict: ``rss`` and ``max_bytes`` in bytes, an ``entries`` list
+                  of dicts with ``model``, ``footprint``, ``pinned`` and
+                  ``last_used``, most recently used last, and ``lingering``,
+                  the names of evicted models still held elsewhere.
+        """
+        with self._lock:
+            entries = [
+                {
+                    "model": os.path.basename(model_path),
+                    "footprint": self._footprints.get(model_path, 0),
+                    "pinned": model_path == self.pinned_model,
+                    "last_used": self._last_used.get(model_path),
+                }
+                for model_path in self._pipelines
+            ]
+            lingering = [
+                os.path.basename(model_path)
+                for model_path in self._lingering_models()
+            ]
+        return {
+            "rss": current_rss(),
+            "max_bytes": self.max_bytes,
+            "entries": entries,
+            "lingering": lingering,
+        }
@@ -0,0 +1,120 @@
+import itertools
+
+
+def parse_int_list(text):
+    """
+    Parses a comma separated list of integers and inclusive ranges, such
+    as ``"1, 2, 10-13"``.
+
+    Args:
+        text (str): The list to parse.
+
+    Returns:
+        List[int]: The values in the order given, without duplicates.
+
+    Raises:
+        ValueError: If an item is not an integer or a range.
+    """
+    values = []
+    for item in text.split(","):
+        item = item.strip()
+        if not item:
+            continue
+        start, separator, end = item.partition("-")
+        if separator and start:
+            values.extend(range(int(start), int(end) + 1))
+        else:
+            values.append(int(item))
+    return list(dict.fromkeys(values))
+
+
+def seed_runs(seeds):
+    """
+    Groups seeds into runs of consecutive values. The pipeline generates
+    ``num_images`` images from seeds ``seed, seed + 1, ...`` in one call,
+    so each run can be produced by a single batched call. Random seeds
+    (-1) always form their own run.
+
+    Args:
+        seeds (List[int]): The seeds to group.
+
+    Returns:
+        List[tuple]: ``(first seed, number of images)`` for each run.
+    """
+    runs = []
+    for seed in seeds:
+        if runs and seed != -1 and runs[-1][0] != -1:
+            first, count = runs[-1]
+            if seed == first + count:
+                runs[-1] = (first, count + 1)
+                continue
+        runs.append((seed, 1))
+    return runs
+
+
+def matrix_variants(base_params, prompts, seeds, samplers, steps):
+    """
+    Expands a prompt/seed/sampler/steps matrix into the pipeline calls that
+    produce it, batching consecutive seeds into one call.
+
+    Args:
+        base_params (dict): Settings shared by every image.
+        prompts (List[str]): Positive prompts.
+        seeds (List[int]): Seeds.
+        samplers (List[str]): Sampler names.
+        steps (List[int]): Step counts.
+
+    Returns:
+        List[dict]: Keyword arguments for each ``generate_txt2img`` call.
+    """
+    variants = []
+    for prompt, sampler_name, step_count in itertools.product(
+        prompts, samplers, steps
+    ):
+        for seed, count in seed_runs(seeds):
+            variants.append(
+                dict(
+                    base_params,
+                    prompt=prompt,
+                    sampler_name=sampler_name,
+                    steps=step_count,
+                    seed=seed,
+                    num_images=count,
+                )
+            )
+    return variants
+
+
+def image_count(variants):
+    """
+    Counts the images a list of calls will produce.
+
+    Args:
+        variants (List[dict]): Keyword arguments for each call.
+
+    Returns:
+        int: The number of images.
+    """
+    return sum(variant.get("num_images", 1) for variant in variants)
+
+
+def image_caption(params, offset):
+    """
+    Describes one image of a call for display in a grid.
+
+    Args:
+        params (dict): Keyword arguments of the call.
+        offset (int): Index of the image within the call.
+
+    Returns:
+        str: The caption.
+    """
+    seed = params["seed"]
+    seed_text = "random seed" if seed == -1 else f"seed {seed + offset}"
+    prompt = params["prompt"]
+    if len(prompt) > 30:
+        prompt = prompt[:29] + "…"
+    return (
+        f"{prompt} · {seed_text} · {params['sampler_name']} · "
+        f"{params['steps']} steps"
+    )
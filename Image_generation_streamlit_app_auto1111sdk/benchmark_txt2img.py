@@ -0,0 +1,195 @@
+"""
+Measures txt2img speed and memory on this machine for every combination of
+the given samplers, step counts and resolutions, and writes seconds per
+step, total latency and peak RSS to a CSV file. Any checkpoint in ./models/
+works, including a tiny test model for quick runs.
+
+Run from this directory:
+
+    python benchmark_txt2img.py --samplers "Euler a,DPM++ 2M" \
+        --steps 10,20 --sizes 256x256,512x512 --threads 4,8
+"""
+
+import argparse
+import csv
+import itertools
+import os
+import threading
+import time
+
+from auto1111sdk import StableDiffusionPipeline
+
+from app.src.cpu_profile import ATTENTION_OPTIONS, CpuProfile
+from app.src.pipeline_cache import current_rss
+
+PROMPT = "a lighthouse on a rocky coast at sunset, highly detailed"
+FIELDS = [
+    "model",
+    "sampler",
+    "steps",
+    "width",
+    "height",
+    "threads",
+    "attention",
+    "low_memory",
+    "run",
+    "latency_s",
+    "seconds_per_step",
+    "peak_rss_mb",
+]
+
+
+class PeakRssMonitor:
+    """
+    Samples the process RSS on a background thread and keeps the highest
+    value seen between ``start`` and ``stop``.
+    """
+
+    def __init__(self, interval=0.05):
+        self.interval = interval
+        self.peak = 0
+        self._stop = threading.Event()
+        self._thread = None
+
+    def _sample(self):
+        while not self._stop.is_set():
+            self.peak = max(self.peak, current_rss())
+            self._stop.wait(self.interval)
+
+    def start(self):
+        self.peak = current_rss()
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._sample, daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        self._thread.join()
+        self.peak = max(self.peak, current_rss())
+        return self.peak
+
+
+def parse_list(text, convert=str):
+    return [convert(item.strip()) for item in text.split(",") if item.strip()]
+
+
+def parse_size(text):
+    width, height = text.lower().split("x")
+    return int(width), int(height)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument(
+        "--model",
+        help="Checkpoint file name in --models-dir; default: all of them.",
+    )
+    parser.add_argument("--models-dir", default="./models/")
+    parser.add_argument("--samplers", default="Euler a,DPM++ 2M Karras")
+    parser.add_argument("--steps", default="10,20")
+    parser.add_argument("--sizes", default="256x256,512x512")
+    parser.add_argument(
+        "--threads",
+        default="",
+        help="Comma separated thread counts; default: all cores.",
+    )
+    parser.add_argument(
+        "--attention",
+        default="Automatic",
+        help=f"Comma separated, from: {', '.join(ATTENTION_OPTIONS)}.",
+    )
+    parser.add_argument(
+        "--low-memory",
+        action="store_true",
+        help="Also measure every configuration in low memory mode.",
+    )
+    parser.add_argument("--runs", type=int, default=2)
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--output", default="benchmark_txt2img.csv")
+    args = parser.parse_args()
+
+    if args.model:
+        model_files = [args.model]
+    else:
+        model_files = sorted(
+            name
+            for name in os.listdir(args.models_dir)
+            if name.endswith((".safetensors", ".ckpt"))
+        )
+    samplers = parse_list(args.samplers)
+    step_counts = parse_list(args.steps, int)
+    sizes = parse_list(args.sizes, parse_size)
+    thread_counts = parse_list(args.threads, int) or [None]
+    attentions = parse_list(args.attention)
+    low_memory_modes = [False, True] if args.low_memory else [False]
+    profiles = [
+        CpuProfile(threads, attention, low_memory)
+        for threads, attention, low_memory in itertools.product(
+            thread_counts, attentions, low_memory_modes
+        )
+    ]
+
+    with open(args.output, "w", newline="") as output_file:
+        writer = csv.DictWriter(output_file, fieldnames=FIELDS)
+        writer.writeheader()
+        for model_file in model_files:
+            print(f"Loading {model_file}...")
+            pipeline = StableDiffusionPipeline(
+                os.path.join(args.models_dir, model_file)
+            )
+            for profile in profiles:
+                profile.apply()
+                # Warm up once so one-off setup is not counted.
+                pipeline.generate_txt2img(
+                    prompt=PROMPT,
+                    seed=args.seed,
+                    steps=1,
+                    width=256,
+                    height=256,
+                    sampler_name=samplers[0],
+                )
+                for sampler, steps, (width, height) in itertools.product(
+                    samplers, step_counts, sizes
+                ):
+                    for run in range(1, args.runs + 1):
+                        monitor = PeakRssMonitor()
+                        monitor.start()
+                        start = time.perf_counter()
+                        pipeline.generate_txt2img(
+                            prompt=PROMPT,
+                            seed=args.seed,
+                            steps=steps,
+                            width=width,
+                            height=height,
+                            sampler_name=sampler,
+                        )
+                        latency = time.perf_counter() - start
+                        peak = monitor.stop()
+                        row = {
+                            "model": model_file,
+                            "sampler": sampler,
+                            "steps": steps,
+                            "width": width,
+                            "height": height,
+                            **profile.settings(),
+                            "run": run,
+                            "latency_s": round(latency, 3),
+                            "seconds_per_step": round(latency / steps, 4),
+                            "peak_rss_mb": round(peak / 1024**2),
+                        }
+                        writer.writerow(row)
+                        output_file.flush()
+                        print(
+                            f"{sampler:<18} {steps:>3} steps "
+                            f"{width}x{height} "
+                            f"threads={row['threads']:<3} "
+                            f"{row['attention']:<26} "
+                            f"{latency:7.2f}s {row['seconds_per_step']:.3f}"
+                            f" s/step {row['peak_rss_mb']} MB"
+                        )
+            del pipeline
+    print(f"Results written to {args.output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,228 @@
+"""
+Extracts invoice data from every image in a directory tree without the
+Streamlit app, writing one JSON line per image. Progress is checkpointed,
+so an interrupted run picks up where it stopped when started again with
+the same output file. Needs an OpenAI API key in OPENAI_API_KEY.
+
+Run from this directory:
+
+    python -m app.batch invoices/ --output results.jsonl --workers 8
+"""
+
+import argparse
+import json
+import os
+import time
+
+from langchain_openai import ChatOpenAI
+from tqdm import tqdm
+
+from app.main import (
+    MAX_WORKERS,
+    image_mime_type,
+    prepare_and_extract,
+    prompt_version,
+)
+from app.src.checkpoint import Checkpoint
+from app.src.concurrent_extraction import extract_concurrently
+from app.src.extraction_cache import ExtractionCache, content_hash, make_key
+from app.src.image_preprocessing import (
+    DETAIL_LEVELS,
+    GRAYSCALE_MODES,
+    preprocessing_options,
+)
+from app.src.invoice_schema import EXTRACTION_MODES, FREE_FORM_MODE
+
+IMAGE_EXTENSIONS = (".jpg", ".jpeg", ".png")
+
+
+def find_images(root):
+    """
+    Walks a directory tree lazily, so that listing a large archive does not
+    hold every path in memory. Entries are yielded in the order the file
+    system lists them, which is not sorted: sorting would need the whole
+    listing of a directory at once. The checkpoint is keyed by path, so the
+    order does not matter for resuming.
+
+    Args:
+        root (str): The directory to search.
+
+    Yields:
+        os.DirEntry: Each image file.
+    """
+    with os.scandir(root) as scan:
+        for entry in scan:
+            if entry.is_dir(follow_symlinks=False):
+                yield from find_images(entry.path)
+            elif entry.name.lower().endswith(IMAGE_EXTENSIONS):
+                yield entry
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("directory", help="Directory of invoice images.")
+    parser.add_argument(
+        "--output",
+        default="results.jsonl",
+        help="JSONL file to append results to.",
+    )
+    parser.add_argument(
+        "--checkpoint",
+        help="Checkpoint database; default: the output path + "
+        ".checkpoint.sqlite3.",
+    )
+    parser.add_argument(
+        "--model", default="gpt-4o", choices=["gpt-4o", "gpt-4o-mini"]
+    )
+    parser.add_argument(
+        "--mode",
+        default=FREE_FORM_MODE,
+        choices=EXTRACTION_MODES,
+        help="Output format; the structured modes follow a fixed schema.",
+    )
+    parser.add_argument(
+        "--workers",
+        type=int,
+        default=MAX_WORKERS,
+        help="Maximum number of concurrent requests.",
+    )
+    parser.add_argument(
+        "--no-preprocess",
+        action="store_true",
+        help="Send images unchanged instead of shrinking them first.",
+    )
+    parser.add_argument("--max-dimension", type=int, default=1600)
+    parser.add_argument(
+        "--grayscale", default="auto", choices=GRAYSCALE_MODES
+    )
+    parser.add_argument("--jpeg-quality", type=int, default=80)
+    parser.add_argument("--detail", default="auto", choices=DETAIL_LEVELS)
+    parser.add_argument(
+        "--max-kb",
+        type=int,
+        default=0,
+        help="Size budget per image in KB; 0 for no limit.",
+    )
+    parser.add_argument(
+        "--max-tokens",
+        type=int,
+        default=0,
+        help="Vision token budget per image; 0 for no limit.",
+    )
+    parser.add_argument(
+        "--cache",
+        help="Results cache database shared with the app, e.g. "
+        "extraction_cache.sqlite3; default: no cache.",
+    )
+    return parser.parse_args(argv)
+
+
+def preprocessing_from_args(args):
+    """
+    Builds the preprocessing settings from the command line arguments.
+
+    Returns:
+        dict: Keyword arguments for preprocess_image, or None when
+              preprocessing is turned off.
+    """
+    if args.no_preprocess:
+        return None
+    return preprocessing_options(
+        args.max_dimension,
+        args.grayscale,
+        args.jpeg_quality,
+        args.detail,
+        max_bytes=args.max_kb * 1024,
+        max_tokens=args.max_tokens,
+    )
+
+
+def main():
+    args = parse_args()
+    checkpoint_path = args.checkpoint or args.output + ".checkpoint.sqlite3"
+    checkpoint = Checkpoint(checkpoint_path)
+    cache = ExtractionCache(args.cache) if args.cache else None
+    preprocessing = preprocessing_from_args(args)
+    llm = ChatOpenAI(
+        model=args.model,
+        openai_api_key=os.environ.get("OPENAI_API_KEY"),
+        temperature=0,
+        max_retries=0,
+    )
+    version = prompt_version(args.mode)
+    counts = {"ok": 0, "error": 0, "skipped": 0, "cached": 0}
+
+    def pending_images():
+        # Consumed by extract_concurrently on this thread, which pulls only
+        # as many files as there are free slots.
+        for entry in find_images(args.directory):
+            stat = entry.stat()
+            if checkpoint.is_finished(entry.path, stat):
+                counts["skipped"] += 1
+                continue
+            yield entry.path, (entry.path, stat)
+
+    def extract(path, stat):
+        # Each worker reads its own file, so only the images in flight are
+        # held in memory.
+        start = time.perf_counter()
+        with open(path, "rb") as image_file:
+            image_data = image_file.read()
+        key = None
+        if cache is not None:
+            image_hash = content_hash(image_data)
+            key = make_key(image_hash, args.model, version, preprocessing)
+            cached = cache.get(key)
+            if cached is not None:
+                return cached, stat, True, time.perf_counter() - start
+        json_response, _ = prepare_and_extract(
+            (image_data, image_mime_type(path)),
+            llm,
+            preprocessing,
+            args.mode,
+        )
+        if key is not None:
+            cache.put(key, image_hash, args.model, version, json_response)
+        return json_response, stat, False, time.perf_counter() - start
+
+    outcomes = extract_concurrently(
+        pending_images(),
+        lambda payload: extract(*payload),
+        max_workers=args.workers,
+    )
+    with open(args.output, "a", encoding="utf-8") as output_file:
+        for _, path, outcome, error in tqdm(outcomes, unit="image"):
+            if error is not None:
+                record = {
+                    "path": path,
+                    "status": "error",
+                    "error": f"{type(error).__name__}: {error}",
+                }
+            else:
+                json_response, stat, from_cache, seconds = outcome
+                record = {
+                    "path": path,
+                    "status": "ok",
+                    "result": json_response,
+                    "seconds": round(seconds, 2),
+                }
+            output_file.write(json.dumps(record, ensure_ascii=False) + "\n")
+            output_file.flush()
+            if error is not None:
+                # Failed images are not checkpointed, so they are retried.
+                counts["error"] += 1
+                continue
+            # Marked only once the line is written: a crash in between
+            # repeats the image on the next run rather than losing it.
+            checkpoint.mark_finished(path, stat)
+            counts["cached" if from_cache else "ok"] += 1
+    checkpoint.close()
+    print(
+        f"Done: {counts['ok']} extracted, {counts['cached']} from the "
+        f"results cache, {counts['error']} failed, {counts['skipped']} "
+        f"already in {args.output}."
+    )
+
+
+if __name__ == "__main__":
+    main()
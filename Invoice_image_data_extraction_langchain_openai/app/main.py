@@ -11,10 +11,67 @@ from langchain_core.prompts import (
 )
 from langchain_openai import ChatOpenAI
 
+from app.src.concurrent_extraction import extract_concurrently
+from app.src.extraction_cache import ExtractionCache, content_hash, make_key
+from app.src.image_preprocessing import (
+    DETAIL_LEVELS,
+    GRAYSCALE_MODES,
+    preprocess_image,
+    preprocessing_options,
+    summarize_savings,
+)
+from app.src.invoice_schema import (
+    COMPACT_MODE,
+    EXTRACTION_MODES,
+    FREE_FORM_MODE,
+    SCHEMA_MODE,
+    SCHEMAS,
+)
+
 parser = JsonOutputParser()
+# Default number of extraction requests sent at the same time.
+MAX_WORKERS = 4
+# Part of the results cache key; bump a mode's version whenever its prompt
+# or schema changes.
+PROMPT_VERSIONS = {FREE_FORM_MODE: "2", SCHEMA_MODE: "1", COMPACT_MODE: "1"}
+EXTRACTION_CACHE_PATH = os.environ.get(
+    "EXTRACTION_CACHE_PATH", "extraction_cache.sqlite3"
+)
+EXTRACTION_CACHE_ENTRIES = int(
+    os.environ.get("EXTRACTION_CACHE_ENTRIES", "10000")
+)
 st.set_page_config(page_title="Invoice Data Extractor")
 
 
+def image_mime_type(image_name):
+    """
+    Guesses the MIME type of an image from its file name.
+
+    Args:
+        image_name (str): The image file name.
+
+    Returns:
+        str: The MIME type, ``image/png`` if it cannot be guessed.
+    """
+    mime_type, _ = guess_type(image_name)
+    return mime_type or "image/png"
+
+
+def image_bytes_to_data_url(image_data, mime_type):
+    """
+    Converts image bytes to a base64-encoded data URL in a single encoding pass, without touching the disk.
+
+    Args:
+        image_data (bytes): The encoded image, e.g. the contents of a PNG file.
+        mime_type (str): The MIME type of the image.
+
+    Returns:
+        str: A base64-encoded data URL representation of the image.
+    """
+    base64_encoded_data = base64.b64encode(image_data).decode("ascii")
+    return f"data:{mime_type};base64,{base64_encoded_data}"
+
+
 def local_image_to_data_url(image_path):
     """
     Converts a local image file to a base64-encoded data URL.
@@ -25,121 +82,337 @@ def local_image_to_data_url(image_path):
     Returns:
         str: A base64-encoded data URL representation of the image.
     """
-    mime_type, _ = guess_type(image_path)
-    if mime_type is None:
-        mime_type = "image/png"
     with open(image_path, "rb") as image_file:
-        base64_encoded_data = base64.b64encode(image_file.read()).decode(
-            "utf-8"
+        return image_bytes_to_data_url(
+            image_file.read(), image_mime_type(image_path)
         )
-    return f"data:{mime_type};base64,{base64_encoded_data}"
 
 
-def generate_image_prompt(image_path):
+def prompt_version(mode):
+    """
+    Returns the version of a mode's prompt, as used in results cache keys.
+
+    Args:
+        mode (str): One of EXTRACTION_MODES.
+
+    Returns:
+        str: The mode and its prompt version, e.g. "compact-1".
+    """
+    return f"{mode}-{PROMPT_VERSIONS[mode]}"
+
+
+def generate_image_prompt(encoded_image_url, detail="auto", mode=FREE_FORM_MODE):
     """
     Generates a prompt template for extracting information from an image.
 
     Args:
-        image_path (str): The path to the local image file.
+        encoded_image_url (str): The image as a base64-encoded data URL.
+        detail (str): The vision detail level: "auto", "high" or "low".
+        mode (str): One of EXTRACTION_MODES. The structured modes leave the output format to the schema.
 
     Returns:
         ChatPromptTemplate: A prompt template ready to be invoked by the LLM.
     """
-    encoded_image_url = local_image_to_data_url(image_path)
+    if mode == FREE_FORM_MODE:
+        text = "Extract all information from image and return only JSON format. {format_instructions}"
+    else:
+        text = "Extract the invoice data from the image."
     prompt_template = HumanMessagePromptTemplate.from_template(
         template=[
-            {
-                "type": "text",
-                "text": "Extract all information from image and return only JSON format. {format_instructions}",
-            },
+            {"type": "text", "text": text},
             {
                 "type": "image_url",
-                "image_url": encoded_image_url,
+                "image_url": {"url": encoded_image_url, "detail": detail},
             },
         ],
     )
     image_prompt = ChatPromptTemplate.from_messages([prompt_template])
-    image_prompt.partial(
-        partial_variables={
-            "format_instructions": parser.get_format_instructions()
-        },
-    )
+    if mode == FREE_FORM_MODE:
+        # partial() returns a new template rather than changing this one.
+        image_prompt = image_prompt.partial(
+            format_instructions=parser.get_format_instructions()
+        )
     return image_prompt
 
 
-def process_images(uploaded_files, llm):
+def prepare_and_extract(image, llm, preprocessing=None, mode=FREE_FORM_MODE):
     """
-    Processes uploaded images, extracts information using the LLM, and displays results.
+    Optionally shrinks an image, then extracts information from it.
 
     Args:
-        uploaded_files (list): List of uploaded image files.
+        image (tuple): The encoded image and its MIME type.
         llm (ChatOpenAI): The LLM model instance to be used for processing.
-    """
-    results = {}
-    for uploaded_file in uploaded_files:
-        temp_image_path = save_temp_image(uploaded_file)
-        json_response = extract_information(temp_image_path, llm)
-        results[uploaded_file.name] = json_response
-
-        display_results(temp_image_path, uploaded_file.name, json_response)
-        cleanup_temp_file(temp_image_path)
+        preprocessing (dict, optional): Keyword arguments for preprocess_image; the image is sent unchanged when not given.
+        mode (str): One of EXTRACTION_MODES.
 
-    return results
+    Returns:
+        tuple: The JSON response and the preprocessing statistics, or None for the statistics when the image was sent unchanged.
+    """
+    image_data, mime_type = image
+    if preprocessing is None:
+        json_response = extract_information(
+            image_data, mime_type, llm, mode=mode
+        )
+        return json_response, None
+    prepared = preprocess_image(image_data, **preprocessing)
+    json_response = extract_information(
+        prepared.data, prepared.mime_type, llm, prepared.detail, mode
+    )
+    return json_response, prepared.stats
 
 
-def save_temp_image(uploaded_file):
+def process_images(uploaded_files,
+                   llm,
+                   max_workers=MAX_WORKERS,
+                   preprocessing=None,
+                   cache=None,
+                   mode=FREE_FORM_MODE):
     """
-    Saves the uploaded image to a temporary file.
+    Processes uploaded images concurrently, extracts information using the LLM, and displays each result as soon as it is ready. Identical images are extracted only once, and images already in the cache are not sent at all.
 
     Args:
-        uploaded_file (UploadedFile): The uploaded file from Streamlit.
+        uploaded_files (list): List of uploaded image files.
+        llm (ChatOpenAI): The LLM model instance to be used for processing.
+        max_workers (int): Maximum number of concurrent LLM requests.
+        preprocessing (dict, optional): Keyword arguments for preprocess_image, applied to every image before it is sent.
+        cache (ExtractionCache, optional): Where results are looked up and stored.
+        mode (str): One of EXTRACTION_MODES.
 
     Returns:
-        str: Path to the saved temporary image.
+        dict: JSON responses keyed by file name, in upload order. Repeated file names get a " (2)", " (3)"... suffix.
     """
-    temp_image_path = f"temp_{uploaded_file.name}"
-    with open(temp_image_path, "wb") as temp_file:
-        temp_file.write(uploaded_file.read())
-    return temp_image_path
+    # Uploads are tracked by position, as several can share a file name.
+    # getvalue() hands out the upload's own bytes without copying them;
+    # the same bytes feed both the request and the preview.
+    images = [
+        (
+            uploaded_file.name,
+            uploaded_file.getvalue(),
+            uploaded_file.type or image_mime_type(uploaded_file.name),
+        )
+        for uploaded_file in uploaded_files
+    ]
+    # Filled in completion order, indexed in upload order.
+    results = [None] * len(images)
+    indices_by_hash = {}
+    for index, (_, image_data, _) in enumerate(images):
+        indices_by_hash.setdefault(content_hash(image_data), []).append(
+            index
+        )
+    cache_keys = {
+        image_hash: make_key(
+            image_hash, llm.model_name, prompt_version(mode), preprocessing
+        )
+        for image_hash in indices_by_hash
+    }
+    progress = st.progress(0.0, text="Extracting...")
+
+    def show(image_hash, json_response, note=None):
+        for index in indices_by_hash[image_hash]:
+            image_name, image_data, _ = images[index]
+            results[index] = json_response
+            display_results(image_data, image_name, json_response)
+            if note:
+                st.caption(note)
+        done = sum(1 for result in results if result is not None)
+        progress.progress(
+            done / len(results),
+            text=f"Extracted {done} of {len(results)} image(s)",
+        )
 
+    pending = []
+    for image_hash, indices in indices_by_hash.items():
+        cached = cache.get(cache_keys[image_hash]) if cache else None
+        if cached is not None:
+            show(image_hash, cached, "Loaded from the results cache")
+        else:
+            _, image_data, mime_type = images[indices[0]]
+            pending.append((image_hash, (image_data, mime_type)))
+
+    outcomes = extract_concurrently(
+        pending,
+        lambda image: prepare_and_extract(image, llm, preprocessing, mode),
+        max_workers=max_workers,
+    )
+    all_stats = []
+    for _, image_hash, outcome, error in outcomes:
+        note = None
+        if error is not None:
+            image_names = ", ".join(
+                images[index][0] for index in indices_by_hash[image_hash]
+            )
+            st.error(f"Extraction failed for {image_names}: {error}")
+            json_response = {"error": str(error)}
+        else:
+            json_response, stats = outcome
+            if cache is not None:
+                cache.put(
+                    cache_keys[image_hash],
+                    image_hash,
+                    llm.model_name,
+                    prompt_version(mode),
+                    json_response,
+                )
+            if stats is not None:
+                all_stats.append(stats)
+                note = (
+                    f"Sent {stats['bytes'] / 1024:.0f} KB instead of "
+                    f"{stats['original_bytes'] / 1024:.0f} KB at "
+                    f"{stats['size'][0]}x{stats['size'][1]}, "
+                    f"{stats['detail']} detail, "
+                    f"about {stats['tokens']} vision tokens"
+                )
+        show(image_hash, json_response, note)
+
+    duplicates = len(images) - len(indices_by_hash)
+    cached_count = len(indices_by_hash) - len(pending)
+    if duplicates or cached_count:
+        st.info(
+            f"{len(pending)} of {len(images)} image(s) sent to the model: "
+            f"{cached_count} found in the results cache, {duplicates} "
+            "duplicate(s) in this batch."
+        )
+    if all_stats:
+        totals = summarize_savings(all_stats)
+        saved_bytes = 1 - totals["bytes"] / totals["original_bytes"]
+        st.info(
+            f"Preprocessing saved {saved_bytes:.0%} of the upload size "
+            f"({totals['original_bytes'] / 1024**2:.1f} MB to "
+            f"{totals['bytes'] / 1024**2:.1f} MB) and about "
+            f"{totals['original_tokens'] - totals['tokens']} vision tokens "
+            f"({totals['original_tokens']} to {totals['tokens']})."
+        )
 
-def extract_information(image_path, llm):
+    labelled = {}
+    for (image_name, _, _), json_response in zip(images, results):
+        label = image_name
+        copy = 1
+        while label in labelled:
+            copy += 1
+            label = f"{image_name} ({copy})"
+        labelled[label] = json_response
+    return labelled
+
+
+def extract_information(image_data,
+                        mime_type,
+                        llm,
+                        detail="auto",
+                        mode=FREE_FORM_MODE,
+                        include_raw=False):
     """
-    Extracts information from an image using the LLM.
+    Extracts information from an image using the LLM. In the free-form mode the model writes whatever JSON it sees fit; the structured modes make it fill in a schema from invoice_schema, and the result is validated against that schema before it is returned.
 
     Args:
-        image_path (str): Path to the image file.
+        image_data (bytes): The encoded image.
+        mime_type (str): The MIME type of the image.
         llm (ChatOpenAI): The LLM model instance to be used for processing.
+        detail (str): The vision detail level: "auto", "high" or "low".
+        mode (str): One of EXTRACTION_MODES.
+        include_raw (bool): Also return the model's message, e.g. to read its token usage.
 
     Returns:
-        dict: JSON response containing the extracted information.
+        dict: JSON response containing the extracted information, or a tuple of it and the AIMessage when include_raw is set.
     """
-    prompt = generate_image_prompt(image_path)
-    chain = prompt | llm | parser
-    json_response = chain.invoke(input=[])
+    prompt = generate_image_prompt(
+        image_bytes_to_data_url(image_data, mime_type), detail, mode
+    )
+    if mode == FREE_FORM_MODE:
+        message = (prompt | llm).invoke(input={})
+        json_response = parser.invoke(message)
+    else:
+        chain = prompt | llm.with_structured_output(
+            SCHEMAS[mode], include_raw=True
+        )
+        output = chain.invoke(input={})
+        if output["parsing_error"] is not None:
+            raise output["parsing_error"]
+        if output["parsed"] is None:
+            raise ValueError("The model returned no invoice data.")
+        message = output["raw"]
+        # Through JSON so that dates come back as strings, as in free-form.
+        json_response = json.loads(output["parsed"].json())
+    if include_raw:
+        return json_response, message
     return json_response
 
 
-def display_results(image_path, image_name, json_response):
+def display_results(image_data, image_name, json_response):
     """
     Displays the image and its corresponding JSON response in the Streamlit app.
 
     Args:
-        image_path (str): Path to the image file.
+        image_data (bytes): The encoded image.
         image_name (str): Name of the image file.
         json_response (dict): JSON response containing the extracted information.
     """
-    st.image(image_path, caption=image_name)
+    st.image(image_data, caption=image_name)
+    with st.expander(f"Results for {image_name}"):
+        st.json(json_response)
 
 
-def cleanup_temp_file(file_path):
+@st.cache_resource
+def load_extraction_cache():
     """
-    Removes the temporary file created during the process.
+    Opens the results cache shared by all sessions.
 
-    Args:
-        file_path (str): Path to the temporary file.
+    Returns:
+        ExtractionCache: The cache.
     """
-    os.remove(file_path)
+    return ExtractionCache(EXTRACTION_CACHE_PATH, EXTRACTION_CACHE_ENTRIES)
+
+
+def show_preprocessing_options():
+    """
+    Shows the image preprocessing settings.
+
+    Returns:
+        dict: Keyword arguments for preprocess_image, or None if preprocessing is turned off.
+    """
+    with st.expander("Image preprocessing"):
+        enabled = st.checkbox(
+            "Shrink images before sending them",
+            value=True,
+            help="Smaller images make requests faster and cheaper. Large phone photos benefit the most.",
+        )
+        max_dimension = st.slider(
+            "Max dimension (px)",
+            min_value=512,
+            max_value=4096,
+            value=1600,
+            step=64,
+        )
+        grayscale = st.selectbox(
+            "Grayscale",
+            GRAYSCALE_MODES,
+            help="auto converts images that carry little colour.",
+        )
+        jpeg_quality = st.slider(
+            "JPEG quality", min_value=40, max_value=95, value=80
+        )
+        detail = st.selectbox(
+            "Vision detail",
+            DETAIL_LEVELS,
+            help="low costs a fixed 85 tokens but only sees a 512x512 image.",
+        )
+        max_kb = st.number_input(
+            "Max size per image (KB, 0 for no limit)", min_value=0, value=0
+        )
+        max_tokens = st.number_input(
+            "Max vision tokens per image (0 for no limit)",
+            min_value=0,
+            value=0,
+        )
+    if not enabled:
+        return None
+    return preprocessing_options(
+        max_dimension,
+        grayscale,
+        jpeg_quality,
+        detail,
+        max_bytes=max_kb * 1024,
+        max_tokens=max_tokens,
+    )
 
 
 def main():
@@ -169,6 +442,25 @@ def main():
         ["gpt-4o", "gpt-4o-mini"],
         index=["gpt-4o", "gpt-4o-mini"].index(st.session_state["model_name"]),
     )
+    max_workers = st.number_input(
+        "Parallel requests",
+        min_value=1,
+        max_value=16,
+        value=MAX_WORKERS,
+        help="Lower this if your API key hits rate limits often.",
+    )
+    mode = st.selectbox(
+        "Output",
+        EXTRACTION_MODES,
+        help="invoice schema returns vendor, dates, totals and line items in a fixed shape; compact returns only the key fields, which is fastest.",
+    )
+    preprocessing = show_preprocessing_options()
+    extraction_cache = load_extraction_cache()
+    use_cache = st.checkbox(
+        f"Reuse cached results ({len(extraction_cache)} stored)",
+        value=True,
+        help="Images already extracted with the same model and settings are not sent again.",
+    )
 
     # File uploader remains visible even after files are uploaded
     uploaded_files = st.file_uploader(
@@ -181,26 +473,38 @@ def main():
         st.session_state["uploaded_files"] = uploaded_files
 
     # Show the extract button only if files have been uploaded
+    just_extracted = False
     if st.session_state["uploaded_files"]:
         if st.button("Extract"):
-            # Initialize the LLM with the selected model and API key
+            # Initialize the LLM with the selected model and API key. Retries
+            # are left to process_images, which backs off all requests
+            # together when the API reports a rate limit.
             llm = ChatOpenAI(
                 model=st.session_state["model_name"],
                 openai_api_key=st.session_state["api_key"],
                 temperature=0,
+                max_retries=0,
             )
 
             st.session_state["extracted_results"] = process_images(
-                st.session_state["uploaded_files"], llm
+                st.session_state["uploaded_files"],
+                llm,
+                max_workers,
+                preprocessing,
+                extraction_cache if use_cache else None,
+                mode,
             )
+            just_extracted = True
 
     # Display the extracted results if available
     if st.session_state["extracted_results"]:
-        for image_name, json_response in st.session_state[
-            "extracted_results"
-        ].items():
-            st.subheader(f"Results for {image_name}")
-            st.json(json_response)
+        # Results were already shown one by one while extracting.
+        if not just_extracted:
+            for image_name, json_response in st.session_state[
+                "extracted_results"
+            ].items():
+                st.subheader(f"Results for {image_name}")
+                st.json(json_response)
 
         if st.button("Download JSON results"):
             json_output = json.dumps(
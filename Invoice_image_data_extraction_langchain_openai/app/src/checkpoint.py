@@ -0,0 +1,61 @@
+import sqlite3
+
+
+class Checkpoint:
+    """
+    Records which files a batch run has finished, in SQLite, so that a
+    restarted run skips them. Lookups go to disk, so memory use does not
+    grow with the number of files. A file counts as finished only while its
+    size and modification time are unchanged.
+    """
+
+    def __init__(self, db_path):
+        """
+        Opens or creates the checkpoint database.
+
+        Args:
+            db_path (str): Path to the SQLite file.
+        """
+        self._connection = sqlite3.connect(db_path)
+        with self._connection:
+            self._connection.execute(
+                """CREATE TABLE IF NOT EXISTS finished (
+                       path TEXT PRIMARY KEY,
+                       size INTEGER NOT NULL,
+                       mtime_ns INTEGER NOT NULL
+                   )"""
+            )
+
+    def is_finished(self, path, stat):
+        """
+        Checks whether a file was finished by an earlier run.
+
+        Args:
+            path (str): The file path as recorded.
+            stat (os.stat_result): The file's current status.
+
+        Returns:
+            bool: True if the file was finished and has not changed since.
+        """
+        row = self._connection.execute(
+            "SELECT size, mtime_ns FROM finished WHERE path = ?", (path,)
+        ).fetchone()
+        return row == (stat.st_size, stat.st_mtime_ns)
+
+    def mark_finished(self, path, stat):
+        """
+        Records a file as finished.
+
+        Args:
+            path (str): The file path.
+            stat (os.stat_result): The file's status when it was read.
+        """
+        with self._connection:
+            self._connection.execute(
+                "INSERT OR REPLACE INTO finished (path, size, mtime_ns) "
+                "VALUES (?, ?, ?)",
+                (path, stat.st_size, stat.st_mtime_ns),
+            )
+
+    def close(self):
+        self._connection.close()
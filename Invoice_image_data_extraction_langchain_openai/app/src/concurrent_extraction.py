@@ -0,0 +1,156 @@
+import random
+import threading
+import time
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+
+from openai import APIConnectionError, InternalServerError, RateLimitError
+
+# Errors worth retrying: rate limits, dropped connections and timeouts
+# (APITimeoutError is an APIConnectionError) and server-side failures.
+RETRYABLE_ERRORS = (RateLimitError, APIConnectionError, InternalServerError)
+
+
+def retry_after(error):
+    """
+    Reads how long the API asked us to wait from a rate limit error.
+
+    Args:
+        error (Exception): The error raised by the API call.
+
+    Returns:
+        float: Seconds to wait, or None if the response does not say.
+    """
+    response = getattr(error, "response", None)
+    if response is None:
+        return None
+    headers = response.headers
+    if "retry-after-ms" in headers:
+        return float(headers["retry-after-ms"]) / 1000
+    try:
+        return float(headers.get("retry-after"))
+    except (TypeError, ValueError):
+        return None
+
+
+class RateLimitGate:
+    """
+    Shared by all workers so that when one request is rate limited, every
+    worker holds off until the limit resets instead of each hammering the
+    API with its own retries.
+    """
+
+    def __init__(self):
+        self._resume_at = 0.0
+        self._lock = threading.Lock()
+
+    def pause(self, seconds):
+        """
+        Blocks new requests for ``seconds`` from now.
+
+        Args:
+            seconds (float): How long to pause.
+        """
+        with self._lock:
+            self._resume_at = max(self._resume_at, time.monotonic() + seconds)
+
+    def wait(self):
+        """
+        Sleeps until requests are allowed again.
+        """
+        while True:
+            with self._lock:
+                delay = self._resume_at - time.monotonic()
+            if delay <= 0:
+                return
+            time.sleep(delay)
+
+
+def call_with_retry(function,
+                    gate,
+                    max_retries=5,
+                    base_delay=1.0,
+                    max_delay=60.0):
+    """
+    Calls ``function``, retrying rate limit, connection and server errors
+    with exponential backoff and jitter. Rate limit errors pause the shared
+    gate for as long as the API asked, or the backoff delay otherwise.
+
+    Args:
+        function (callable): The call to make, without arguments.
+        gate (RateLimitGate): The gate shared by all workers.
+        max_retries (int): Retries before the error is raised.
+        base_delay (float): Delay before the first retry, in seconds.
+        max_delay (float): Upper bound on a single delay, in seconds.
+
+    Returns:
+        The return value of ``function``.
+    """
+    for attempt in range(max_retries + 1):
+        gate.wait()
+        try:
+            return function()
+        except RETRYABLE_ERRORS as e:
+            if attempt == max_retries:
+                raise
+            delay = min(base_delay * 2**attempt, max_delay)
+            delay *= random.uniform(0.5, 1.0)
+            if isinstance(e, RateLimitError):
+                gate.pause(retry_after(e) or delay)
+            else:
+                time.sleep(delay)
+
+
+def extract_concurrently(items,
+                         extract,
+                         max_workers=4,
+                         max_retries=5,
+                         max_pending=None):
+    """
+    Runs ``extract`` on every item with at most ``max_workers`` requests in
+    flight and yields each outcome as soon as it is ready. Items are pulled
+    from ``items`` only as capacity frees up, so a long generator of items
+    is never held in memory at once.
+
+    Args:
+        items (iterable): ``(name, payload)`` pairs.
+        extract (callable): Extracts the information from one payload.
+        max_workers (int): Maximum number of concurrent requests.
+        max_retries (int): Retries per item for retryable errors.
+        max_pending (int, optional): Maximum number of items submitted but
+                                     not yet yielded; twice ``max_workers``
+                                     by default.
+
+    Yields:
+        tuple: ``(index, name, result, error)`` in completion order, where
+               ``index`` is the item's position in ``items`` and exactly one
+               of ``result`` and ``error`` is None.
+    """
+    max_pending = max_pending or max_workers * 2
+    gate = RateLimitGate()
+    items = enumerate(items)
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        pending = {}
+        exhausted = False
+        while True:
+            while not exhausted and len(pending) < max_pending:
+                try:
+                    index, (name, payload) = next(items)
+                except StopIteration:
+                    exhausted = True
+                    break
+                future = executor.submit(
+                    call_with_retry,
+                    lambda payload=payload: extract(payload),
+                    gate,
+                    max_retries,
+                )
+                pending[future] = (index, name)
+            if not pending:
+                return
+            done, _ = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                index, name = pending.pop(future)
+                try:
+                    yield index, name, future.result(), None
+                except Exception as e:
+                    yield index, name, None, e
@@ -0,0 +1,148 @@
+import hashlib
+import json
+import sqlite3
+import threading
+import time
+
+
+def content_hash(image_data):
+    """
+    Hashes the bytes of an image, so identical uploads are recognized
+    whatever their file name.
+
+    Args:
+        image_data (bytes): The encoded image.
+
+    Returns:
+        str: The hex SHA-256 digest.
+    """
+    return hashlib.sha256(image_data).hexdigest()
+
+
+def make_key(image_hash, model, prompt_version, options=None):
+    """
+    Builds the cache key of an extraction.
+
+    Args:
+        image_hash (str): Content hash of the original image.
+        model (str): The model name.
+        prompt_version (str): Version of the extraction prompt; bump it
+                              whenever the prompt changes.
+        options (dict, optional): Other settings that change the result,
+                                  such as image preprocessing.
+
+    Returns:
+        str: A hex digest identifying the extraction.
+    """
+    raw = "\x1f".join(
+        [
+            image_hash,
+            model,
+            prompt_version,
+            json.dumps(options or {}, sort_keys=True),
+        ]
+    )
+    return hashlib.sha256(raw.encode("utf-8")).hexdigest()
+
+
+class ExtractionCache:
+    """
+    A persistent cache of parsed extraction results stored in SQLite. The
+    least recently used entries are deleted once it holds more than
+    ``max_entries`` results.
+    """
+
+    def __init__(self, db_path, max_entries=10000):
+        """
+        Opens or creates the cache database.
+
+        Args:
+            db_path (str): Path to the SQLite file.
+            max_entries (int): Number of results to keep.
+        """
+        self.max_entries = max_entries
+        self._lock = threading.Lock()
+        self._connection = sqlite3.connect(db_path, check_same_thread=False)
+        with self._lock, self._connection:
+            self._connection.execute(
+                """CREATE TABLE IF NOT EXISTS extractions (
+                       key TEXT PRIMARY KEY,
+                       image_hash TEXT NOT NULL,
+                       model TEXT NOT NULL,
+                       prompt_version TEXT NOT NULL,
+                       result TEXT NOT NULL,
+                       last_used REAL NOT NULL
+                   )"""
+            )
+            self._connection.execute(
+                "CREATE INDEX IF NOT EXISTS extractions_last_used "
+                "ON extractions (last_used)"
+            )
+
+    def get(self, key):
+        """
+        Looks up a result and marks it as recently used.
+
+        Args:
+            key (str): A key built with ``make_key``.
+
+        Returns:
+            dict: The parsed result, or None if it is not cached.
+        """
+        with self._lock, self._connection:
+            row = self._connection.execute(
+                "SELECT result FROM extractions WHERE key = ?", (key,)
+            ).fetchone()
+            if row is None:
+                return None
+            self._connection.execute(
+                "UPDATE extractions SET last_used = ? WHERE key = ?",
+                (time.time(), key),
+            )
+        return json.loads(row[0])
+
+    def put(self, key, image_hash, model, prompt_version, result):
+        """
+        Stores a result and evicts the least recently used ones if the
+        cache is full.
+
+        Args:
+            key (str): A key built with ``make_key``.
+            image_hash (str): Content hash of the image.
+            model (str): The model name.
+            prompt_version (str): Version of the extraction prompt.
+            result (dict): The parsed extraction result.
+        """
+        with self._lock, self._connection:
+            self._connection.execute(
+                "INSERT OR REPLACE INTO extractions "
+                "(key, image_hash, model, prompt_version, result, last_used) "
+                "VALUES (?, ?, ?, ?, ?, ?)",
+                (
+                    key,
+                    image_hash,
+                    model,
+                    prompt_version,
+                    json.dumps(result, ensure_ascii=False),
+                    time.time(),
+                ),
+            )
+            self._connection.execute(
+                "DELETE FROM extractions WHERE key IN ("
+                "SELECT key FROM extractions ORDER BY last_used DESC "
+                "LIMIT -1 OFFSET ?)",
+                (self.max_entries,),
+            )
+
+    def clear(self):
+        """
+        Deletes every cached result.
+        """
+        with self._lock, self._connection:
+            self._connection.execute("DELETE FROM extractions")
+
+    def __len__(self):
+        with self._lock:
+            return self._connection.execute(
+                "SELECT COUNT(*) FROM extractions"
+            ).fetchone()[0]
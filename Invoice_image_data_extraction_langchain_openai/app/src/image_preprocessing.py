@@ -0,0 +1,238 @@
+import io
+import math
+from collections import namedtuple
+
+from PIL import Image, ImageOps
+
+DETAIL_LEVELS = ["auto", "high", "low"]
+GRAYSCALE_MODES = ["auto", "always", "never"]
+# Images whose pixels differ between colour channels by less than this on
+# average are treated as grayscale scans.
+GRAYSCALE_TOLERANCE = 12
+# The lowest JPEG quality tried when shrinking an image to a byte budget.
+MIN_JPEG_QUALITY = 40
+# A low detail image is always seen at 512x512 and costs a fixed amount.
+LOW_DETAIL_SIZE = 512
+LOW_DETAIL_TOKENS = 85
+
+PreparedImage = namedtuple(
+    "PreparedImage", ["data", "mime_type", "detail", "stats"]
+)
+
+
+def estimate_vision_tokens(width, height, detail="high"):
+    """
+    Estimates the input tokens an image costs with OpenAI vision models:
+    the image is fit within 2048x2048, its shortest side is scaled down to
+    768 and every 512x512 tile costs 170 tokens on top of a base of 85.
+
+    Args:
+        width (int): Image width in pixels.
+        height (int): Image height in pixels.
+        detail (str): One of ``DETAIL_LEVELS``; ``auto`` is counted as
+                      ``high``.
+
+    Returns:
+        int: The estimated token count.
+    """
+    if detail == "low":
+        return LOW_DETAIL_TOKENS
+    scale = min(1.0, 2048 / max(width, height))
+    width, height = width * scale, height * scale
+    scale = min(1.0, 768 / min(width, height))
+    width, height = width * scale, height * scale
+    tiles = math.ceil(width / 512) * math.ceil(height / 512)
+    return LOW_DETAIL_TOKENS + 170 * tiles
+
+
+def is_mostly_grayscale(image, tolerance=GRAYSCALE_TOLERANCE):
+    """
+    Checks whether an image carries little colour, like most scanned or
+    photographed invoices.
+
+    Args:
+        image (PIL.Image.Image): An RGB image.
+        tolerance (int): Largest average channel spread still considered
+                         gray.
+
+    Returns:
+        bool: True if the image looks grayscale.
+    """
+    sample = image.resize((64, 64))
+    pixels = list(sample.getdata())
+    spread = sum(max(pixel) - min(pixel) for pixel in pixels)
+    return spread / len(pixels) < tolerance
+
+
+def _to_rgb(image):
+    if image.mode in ("RGBA", "LA", "P"):
+        # Flatten transparency onto white, the colour of paper.
+        image = image.convert("RGBA")
+        background = Image.new("RGB", image.size, "white")
+        background.paste(image, mask=image.getchannel("A"))
+        return background
+    return image.convert("RGB")
+
+
+def _encode(image, image_format, jpeg_quality):
+    buffer = io.BytesIO()
+    if image_format == "JPEG":
+        image.save(buffer, "JPEG", quality=jpeg_quality, optimize=True)
+    else:
+        image.save(buffer, "PNG", optimize=True)
+    return buffer.getvalue()
+
+
+def _encode_smallest(image, jpeg_quality):
+    # Photos compress far better as JPEG, while flat rendered documents
+    # can be smaller as PNG. Keep whichever is smaller.
+    candidates = [
+        (_encode(image, "JPEG", jpeg_quality), "image/jpeg"),
+        (_encode(image, "PNG", jpeg_quality), "image/png"),
+    ]
+    return min(candidates, key=lambda candidate: len(candidate[0]))
+
+
+def preprocess_image(image_data,
+                     max_dimension=1600,
+                     grayscale="auto",
+                     jpeg_quality=80,
+                     detail="auto",
+                     max_bytes=None,
+                     max_tokens=None):
+    """
+    Shrinks an image before it is sent to a vision model. It is rotated
+    upright, converted to grayscale when it has little colour, resized so
+    that its longest side fits ``max_dimension`` and re-encoded as JPEG or
+    PNG, whichever is smaller. It is then shrunk further until it fits the
+    byte and token budgets. The original is kept if processing would not
+    make it smaller.
+
+    Args:
+        image_data (bytes): The encoded image.
+        max_dimension (int): Longest side in pixels after resizing.
+        grayscale (str): One of ``GRAYSCALE_MODES``.
+        jpeg_quality (int): Starting JPEG quality, 1 to 95.
+        detail (str): One of ``DETAIL_LEVELS``. ``auto`` uses ``high``
+                      detail unless the token budget only allows ``low``.
+        max_bytes (int, optional): Size budget for the encoded image.
+        max_tokens (int, optional): Vision token budget for the image.
+
+    Returns:
+        PreparedImage: The image to send, its MIME type, the detail level to
+                       request and a dict of before and after statistics.
+    """
+    image = Image.open(io.BytesIO(image_data))
+    image_format = image.format
+    original_size = image.size
+    image = _to_rgb(ImageOps.exif_transpose(image))
+    make_gray = grayscale == "always" or (
+        grayscale == "auto" and is_mostly_grayscale(image)
+    )
+    if make_gray:
+        image = image.convert("L")
+
+    if detail == "auto":
+        high_tokens = estimate_vision_tokens(*image.size, "high")
+        low_only = max_tokens is not None and max_tokens < high_tokens
+        # Fewer tiles may still fit the budget at high detail; only fall
+        # back to low detail when even a single tile would not.
+        single_tile = estimate_vision_tokens(512, 512, "high")
+        use_low = low_only and max_tokens < single_tile
+        detail = "low" if use_low else "high"
+    if detail == "low":
+        # The model only sees a 512x512 version anyway.
+        max_dimension = min(max_dimension, LOW_DETAIL_SIZE)
+
+    def fits(candidate, encoded):
+        if max_bytes is not None and len(encoded) > max_bytes:
+            return False
+        if max_tokens is not None and detail != "low":
+            if estimate_vision_tokens(*candidate.size, detail) > max_tokens:
+                return False
+        return True
+
+    dimension = max_dimension
+    quality = jpeg_quality
+    while True:
+        resized = image.copy()
+        resized.thumbnail((dimension, dimension), Image.LANCZOS)
+        encoded, mime_type = _encode_smallest(resized, quality)
+        if fits(resized, encoded) or dimension <= 256:
+            break
+        # Trade JPEG quality first, then resolution.
+        if mime_type == "image/jpeg" and quality > MIN_JPEG_QUALITY:
+            quality = max(quality - 10, MIN_JPEG_QUALITY)
+        else:
+            dimension = int(max(resized.size) * 0.8)
+
+    # Same size means the same token cost, so only bytes matter here.
+    if resized.size == original_size and len(image_data) <= len(encoded):
+        encoded = image_data
+        mime_type = Image.MIME.get(image_format, "image/png")
+        make_gray = False
+
+    stats = {
+        "original_bytes": len(image_data),
+        "bytes": len(encoded),
+        "original_size": original_size,
+        "size": resized.size,
+        "original_tokens": estimate_vision_tokens(*original_size, "high"),
+        "tokens": estimate_vision_tokens(*resized.size, detail),
+        "detail": detail,
+        "grayscale": make_gray,
+        "mime_type": mime_type,
+    }
+    return PreparedImage(encoded, mime_type, detail, stats)
+
+
+def preprocessing_options(max_dimension=1600,
+                          grayscale="auto",
+                          jpeg_quality=80,
+                          detail="auto",
+                          max_bytes=None,
+                          max_tokens=None):
+    """
+    Builds the keyword arguments for ``preprocess_image``. The app and the
+    batch extractor both build their settings here, so that the same
+    settings always give the same results cache key.
+
+    Args:
+        max_dimension (int): Longest side in pixels after resizing.
+        grayscale (str): One of ``GRAYSCALE_MODES``.
+        jpeg_quality (int): Starting JPEG quality, 1 to 95.
+        detail (str): One of ``DETAIL_LEVELS``.
+        max_bytes (int, optional): Size budget; 0 or None for no limit.
+        max_tokens (int, optional): Token budget; 0 or None for no limit.
+
+    Returns:
+        dict: Every ``preprocess_image`` setting, with None for no limit.
+    """
+    return {
+        "max_dimension": max_dimension,
+        "grayscale": grayscale,
+        "jpeg_quality": jpeg_quality,
+        "detail": detail,
+        "max_bytes": max_bytes or None,
+        "max_tokens": max_tokens or None,
+    }
+
+
+def summarize_savings(stats_list):
+    """
+    Adds up the savings of several preprocessed images.
+
+    Args:
+        stats_list (List[dict]): ``stats`` of each ``PreparedImage``.
+
+    Returns:
+        dict: Totals of ``original_bytes``, ``bytes``, ``original_tokens``
+              and ``tokens``.
+    """
+    totals = dict.fromkeys(
+        ["original_bytes", "bytes", "original_tokens", "tokens"], 0
+    )
+    for stats in stats_list:
+        for key in totals:
+            totals[key] += stats[key]
+    return totals
@@ -0,0 +1,114 @@
+import re
+from datetime import date, datetime
+from typing import List, Optional
+
+from langchain_core.pydantic_v1 import BaseModel, Field, validator
+
+FREE_FORM_MODE = "free-form"
+SCHEMA_MODE = "invoice schema"
+COMPACT_MODE = "compact"
+EXTRACTION_MODES = [FREE_FORM_MODE, SCHEMA_MODE, COMPACT_MODE]
+
+# Formats tried, in order, when the model does not answer with an ISO date.
+# Day first comes before month first, as most invoices outside the US use it.
+DATE_FORMATS = [
+    "%Y-%m-%d",
+    "%Y/%m/%d",
+    "%d.%m.%Y",
+    "%d/%m/%Y",
+    "%m/%d/%Y",
+    "%d-%m-%Y",
+    "%d %B %Y",
+    "%d %b %Y",
+    "%B %d %Y",
+    "%b %d %Y",
+]
+
+
+def parse_date(value):
+    """
+    Reads a date written the way invoices usually write one. Anything that
+    cannot be read becomes None, so that one odd date does not fail the
+    whole invoice.
+
+    Args:
+        value: The value returned by the model.
+
+    Returns:
+        date: The date, or None.
+    """
+    if value is None or isinstance(value, date):
+        return value
+    # "August 1st, 2024" -> "August 1 2024"
+    text = re.sub(r"(\d)(st|nd|rd|th)\b", r"\1", str(value))
+    text = " ".join(text.replace(",", " ").split())
+    for date_format in DATE_FORMATS:
+        try:
+            return datetime.strptime(text, date_format).date()
+        except ValueError:
+            continue
+    return None
+
+
+class LineItem(BaseModel):
+    """One billed line of an invoice."""
+
+    description: str = Field(description="What was billed.")
+    quantity: Optional[float] = Field(None, description="Number of units.")
+    unit_price: Optional[float] = Field(None, description="Price per unit.")
+    amount: Optional[float] = Field(None, description="Total of the line.")
+
+
+class Invoice(BaseModel):
+    """The data of an invoice. Use null for anything not on the invoice."""
+
+    vendor_name: Optional[str] = Field(
+        None, description="Company or person issuing the invoice."
+    )
+    vendor_address: Optional[str] = None
+    customer_name: Optional[str] = Field(
+        None, description="Company or person billed."
+    )
+    invoice_number: Optional[str] = None
+    invoice_date: Optional[date] = Field(
+        None, description="ISO date, YYYY-MM-DD."
+    )
+    due_date: Optional[date] = Field(
+        None, description="ISO date, YYYY-MM-DD."
+    )
+    currency: Optional[str] = Field(
+        None, description="ISO 4217 code, e.g. USD."
+    )
+    subtotal: Optional[float] = Field(None, description="Total before tax.")
+    tax: Optional[float] = None
+    total: Optional[float] = Field(None, description="Amount due.")
+    line_items: List[LineItem] = Field(default_factory=list)
+
+    _parse_dates = validator(
+        "invoice_date", "due_date", pre=True, allow_reuse=True
+    )(parse_date)
+
+
+class InvoiceSummary(BaseModel):
+    """The key fields of an invoice. Use null for anything not on it."""
+
+    vendor_name: Optional[str] = None
+    invoice_number: Optional[str] = None
+    invoice_date: Optional[date] = Field(
+        None, description="ISO date, YYYY-MM-DD."
+    )
+    due_date: Optional[date] = Field(
+        None, description="ISO date, YYYY-MM-DD."
+    )
+    currency: Optional[str] = Field(
+        None, description="ISO 4217 code, e.g. USD."
+    )
+    total: Optional[float] = Field(None, description="Amount due.")
+
+    _parse_dates = validator(
+        "invoice_date", "due_date", pre=True, allow_reuse=True
+    )(parse_date)
+
+
+# The model each structured mode is constrained to.
+SCHEMAS = {SCHEMA_MODE: Invoice, COMPACT_MODE: InvoiceSummary}
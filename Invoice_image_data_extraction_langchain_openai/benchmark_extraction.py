@@ -0,0 +1,123 @@
+"""
+Compares the extraction modes on the example invoices: output tokens,
+input tokens, latency and the number of fields returned by the free-form
+JSON mode and the schema-constrained modes. Needs an OpenAI API key in
+OPENAI_API_KEY.
+
+Run from this directory:
+
+    python benchmark_extraction.py --model gpt-4o-mini --runs 3
+"""
+
+import argparse
+import csv
+import os
+import statistics
+import time
+
+from langchain_openai import ChatOpenAI
+
+from app.main import extract_information, image_mime_type
+from app.src.invoice_schema import EXTRACTION_MODES
+
+FIELDS = [
+    "mode",
+    "image",
+    "run",
+    "latency_s",
+    "input_tokens",
+    "output_tokens",
+    "fields",
+]
+
+
+def count_fields(value):
+    """
+    Counts the scalar values in a JSON value, nested ones included.
+    """
+    if isinstance(value, dict):
+        return sum(count_fields(item) for item in value.values())
+    if isinstance(value, list):
+        return sum(count_fields(item) for item in value)
+    return 0 if value is None else 1
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--images", default="example_image")
+    parser.add_argument("--model", default="gpt-4o-mini")
+    parser.add_argument(
+        "--modes",
+        default=",".join(EXTRACTION_MODES),
+        help=f"Comma separated, from: {', '.join(EXTRACTION_MODES)}.",
+    )
+    parser.add_argument("--runs", type=int, default=3)
+    parser.add_argument("--output", help="Also write every run to this CSV.")
+    args = parser.parse_args()
+
+    llm = ChatOpenAI(
+        model=args.model,
+        openai_api_key=os.environ["OPENAI_API_KEY"],
+        temperature=0,
+    )
+    modes = [mode.strip() for mode in args.modes.split(",") if mode.strip()]
+    images = []
+    for file_name in sorted(os.listdir(args.images)):
+        with open(os.path.join(args.images, file_name), "rb") as image_file:
+            images.append(
+                (file_name, image_file.read(), image_mime_type(file_name))
+            )
+
+    rows = []
+    for mode in modes:
+        for file_name, image_data, mime_type in images:
+            for run in range(1, args.runs + 1):
+                start = time.perf_counter()
+                json_response, message = extract_information(
+                    image_data, mime_type, llm, mode=mode, include_raw=True
+                )
+                latency = time.perf_counter() - start
+                usage = message.usage_metadata or {}
+                rows.append(
+                    {
+                        "mode": mode,
+                        "image": file_name,
+                        "run": run,
+                        "latency_s": round(latency, 3),
+                        "input_tokens": usage.get("input_tokens"),
+                        "output_tokens": usage.get("output_tokens"),
+                        "fields": count_fields(json_response),
+                    }
+                )
+                print(
+                    f"{mode:<15} {file_name:<20} run {run} "
+                    f"{latency:6.2f}s {usage.get('output_tokens')} "
+                    "output tokens"
+                )
+
+    if args.output:
+        with open(args.output, "w", newline="") as output_file:
+            writer = csv.DictWriter(output_file, fieldnames=FIELDS)
+            writer.writeheader()
+            writer.writerows(rows)
+
+    print()
+    print(
+        f"{'mode':<15} {'latency s':>10} {'input tok':>10} "
+        f"{'output tok':>11} {'fields':>7}"
+    )
+    for mode in modes:
+        results = [row for row in rows if row["mode"] == mode]
+
+        def mean(field):
+            return statistics.mean(row[field] or 0 for row in results)
+
+        print(
+            f"{mode:<15} {mean('latency_s'):>10.2f} "
+            f"{mean('input_tokens'):>10.0f} {mean('output_tokens'):>11.0f} "
+            f"{mean('fields'):>7.1f}"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,133 @@
+"""
+Checks how much each image preprocessing setting shrinks the example
+invoices and whether the extracted data stays the same. The data extracted
+from the unchanged image is the reference; agreement is the share of its
+values that are also found with the preprocessed image. Needs an OpenAI
+API key in OPENAI_API_KEY unless --offline is given.
+
+Run from this directory:
+
+    python check_preprocessing.py --model gpt-4o-mini
+    python check_preprocessing.py --offline
+"""
+
+import argparse
+import io
+import os
+import re
+import statistics
+import time
+from collections import Counter
+
+from langchain_openai import ChatOpenAI
+from PIL import Image
+
+from app.main import extract_information, image_mime_type
+from app.src.image_preprocessing import (
+    estimate_vision_tokens,
+    preprocess_image,
+)
+
+SETTINGS = [
+    ("default", {}),
+    ("1024px q70", {"max_dimension": 1024, "jpeg_quality": 70}),
+    (
+        "768px gray q60",
+        {"max_dimension": 768, "grayscale": "always", "jpeg_quality": 60},
+    ),
+    ("300 token budget", {"max_tokens": 300}),
+    ("low detail", {"detail": "low"}),
+]
+
+
+def leaf_values(value):
+    """
+    Lists every scalar in a JSON value, normalized so that formatting
+    differences such as case, spacing and thousands separators do not count.
+    """
+    if isinstance(value, dict):
+        return [leaf for item in value.values() for leaf in leaf_values(item)]
+    if isinstance(value, list):
+        return [leaf for item in value for leaf in leaf_values(item)]
+    normalized = re.sub(r"[\s,]", "", str(value).lower())
+    return [normalized] if normalized else []
+
+
+def agreement(reference, candidate):
+    expected = Counter(leaf_values(reference))
+    if not expected:
+        return 1.0
+    found = Counter(leaf_values(candidate))
+    return sum((expected & found).values()) / sum(expected.values())
+
+
+def timed_extract(image_data, mime_type, llm, detail="auto"):
+    start = time.perf_counter()
+    json_response = extract_information(image_data, mime_type, llm, detail)
+    return json_response, time.perf_counter() - start
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--images", default="example_image")
+    parser.add_argument("--model", default="gpt-4o-mini")
+    parser.add_argument(
+        "--offline",
+        action="store_true",
+        help="Only report sizes and token estimates, without API calls.",
+    )
+    args = parser.parse_args()
+
+    llm = None
+    if not args.offline:
+        llm = ChatOpenAI(
+            model=args.model,
+            openai_api_key=os.environ["OPENAI_API_KEY"],
+            temperature=0,
+        )
+
+    rows = {name: [] for name, _ in [("original", None)] + SETTINGS}
+    for file_name in sorted(os.listdir(args.images)):
+        path = os.path.join(args.images, file_name)
+        with open(path, "rb") as image_file:
+            image_data = image_file.read()
+        mime_type = image_mime_type(file_name)
+
+        with Image.open(io.BytesIO(image_data)) as image:
+            original_tokens = estimate_vision_tokens(*image.size)
+        reference, latency = None, None
+        if llm is not None:
+            reference, latency = timed_extract(image_data, mime_type, llm)
+        rows["original"].append(
+            (len(image_data), original_tokens, latency, 1.0)
+        )
+
+        for name, options in SETTINGS:
+            prepared = preprocess_image(image_data, **options)
+            score, latency = None, None
+            if llm is not None:
+                candidate, latency = timed_extract(
+                    prepared.data, prepared.mime_type, llm, prepared.detail
+                )
+                score = agreement(reference, candidate)
+            rows[name].append(
+                (len(prepared.data), prepared.stats["tokens"], latency, score)
+            )
+
+    header = f"{'setting':<18} {'KB':>7} {'tokens':>7}"
+    if llm is not None:
+        header += f" {'latency s':>10} {'agreement':>10}"
+    print(header)
+    for name, results in rows.items():
+        size_kb = statistics.mean(row[0] for row in results) / 1024
+        tokens = statistics.mean(row[1] for row in results)
+        line = f"{name:<18} {size_kb:>7.0f} {tokens:>7.0f}"
+        if llm is not None:
+            latency = statistics.mean(row[2] for row in results)
+            score = statistics.mean(row[3] for row in results)
+            line += f" {latency:>10.2f} {score:>10.0%}"
+        print(line)
+
+
+if __name__ == "__main__":
+    main()
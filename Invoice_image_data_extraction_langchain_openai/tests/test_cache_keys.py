@@ -0,0 +1,28 @@
+import pytest
+
+from app.src.extraction_cache import make_key
+from app.src.image_preprocessing import preprocessing_options
+
+
+def key(options):
+    return make_key("0" * 64, "gpt-4o", "free-form-2", options)
+
+
+def test_unset_budgets_give_the_same_key():
+    assert key(preprocessing_options()) == key(
+        preprocessing_options(max_bytes=0, max_tokens=0)
+    )
+
+
+def test_app_and_batch_settings_give_the_same_key():
+    pytest.importorskip("streamlit")
+    pytest.importorskip("langchain_openai")
+    pytest.importorskip("tqdm")
+    from app.batch import parse_args, preprocessing_from_args
+    from app.main import show_preprocessing_options
+
+    # Outside `streamlit run`, every widget returns its default value.
+    app_options = show_preprocessing_options()
+    batch_options = preprocessing_from_args(parse_args(["invoices"]))
+    assert app_options == batch_options
+    assert key(app_options) == key(batch_options)
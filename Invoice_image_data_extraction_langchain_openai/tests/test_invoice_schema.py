@@ -0,0 +1,29 @@
+from datetime import date
+
+import pytest
+
+pytest.importorskip("langchain_core")
+
+from app.src.invoice_schema import Invoice, InvoiceSummary  # noqa: E402
+
+
+@pytest.mark.parametrize(
+    "written",
+    [
+        "2024-03-12",
+        "12/03/2024",
+        "12.03.2024",
+        "12 March 2024",
+        "March 12th, 2024",
+    ],
+)
+def test_common_date_formats_are_read(written):
+    assert InvoiceSummary(invoice_date=written).invoice_date == date(
+        2024, 3, 12
+    )
+
+
+def test_unreadable_date_does_not_fail_the_invoice():
+    invoice = Invoice(vendor_name="ACME", invoice_date="soon", total=12.5)
+    assert invoice.invoice_date is None
+    assert invoice.total == 12.5
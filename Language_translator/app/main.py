@@ -1,10 +1,96 @@
+import contextlib
+import io
+import json
+import os
+import tempfile
+import threading
+
 import streamlit as st
 from langchain.prompts import ChatPromptTemplate
 from langchain_core.output_parsers import StrOutputParser
 from langchain_openai import ChatOpenAI
 
+from app.src.file_translation import SUPPORTED_EXTENSIONS, translate_file
+from app.src.long_document import split_into_chunks, translate_in_order
+from app.src.multi_target import parse_languages, translate_to_languages
+from app.src.translation_memory import (
+    TranslationMemory,
+    translate_segments_with_memory,
+    translate_with_memory,
+)
+
 st.set_page_config(page_title="Language Translator")
 
+TRANSLATION_MEMORY_PATH = os.environ.get(
+    "TRANSLATION_MEMORY_PATH", "translation_memory.sqlite3"
+)
+
+template = """
+    Please translate the given text into {language} language\n\n\n
+
+    {text} \n
+
+    Please return only the translated language
+    """
+
+segments_template = """
+Translate each string in the following JSON array into {language} language.
+Return only a JSON array of strings with the translations, in the same
+order and with exactly {count} items.
+
+{segments}
+"""
+
+prompt = ChatPromptTemplate.from_template(template)
+segments_prompt = ChatPromptTemplate.from_template(segments_template)
+parser = StrOutputParser()
+
+
+@st.cache_resource
+def load_translation_memory(db_path):
+    return TranslationMemory(db_path)
+
+
+def translate_segments(segments, language, llm):
+    """
+    Translates a list of segments with a single model call, falling back to
+    one call per segment if the model does not return a matching list.
+
+    Args:
+        segments (list): The source segments.
+        language (str): The target language.
+        llm (ChatOpenAI): The language model instance.
+
+    Returns:
+        list: The translated segments, in order.
+    """
+    chain = segments_prompt | llm | parser
+    response = chain.invoke(
+        {
+            "language": language,
+            "count": len(segments),
+            "segments": json.dumps(segments, ensure_ascii=False),
+        }
+    )
+    try:
+        translations = json.loads(
+            response.strip().removeprefix("```json").strip("`")
+        )
+    except json.JSONDecodeError:
+        translations = None
+    if (
+        isinstance(translations, list)
+        and len(translations) == len(segments)
+        and all(isinstance(t, str) for t in translations)
+    ):
+        return translations
+
+    single_chain = prompt | llm | parser
+    return single_chain.batch(
+        [{"text": segment, "language": language} for segment in segments]
+    )
+
+
 if "api_key" not in st.session_state:
     st.session_state["api_key"] = ""
 if "model_name" not in st.session_state:
@@ -31,37 +117,212 @@ st.session_state["input_text"] = st.text_area(
     "Enter the text you want to translate:",
     value=st.session_state["input_text"],
 )
+uploaded_file = st.file_uploader(
+    "Or upload a subtitle, Markdown or text file to translate:",
+    type=SUPPORTED_EXTENSIONS,
+)
 st.session_state["target_language"] = st.text_input(
-    "Enter the target language (e.g., 'Japanese'):",
+    "Enter the target language(s), comma separated "
+    "(e.g., 'Japanese, French'):",
     value=st.session_state["target_language"],
 )
+use_memory = st.checkbox(
+    "Use translation memory (reuse previously translated sentences)",
+    value=False,
+    help=(
+        "Translates sentence by sentence instead of the whole text in one "
+        "request, so the model sees no context across sentences."
+    ),
+)
+long_document_mode = st.checkbox(
+    "Long document mode (translate paragraphs in parallel and stream)",
+    value=False,
+)
+if long_document_mode or uploaded_file:
+    chunk_tokens = st.number_input(
+        "Maximum tokens per chunk", min_value=200, value=1500, step=100
+    )
+    max_concurrency = st.number_input(
+        "Maximum concurrent requests", min_value=1, value=4, step=1
+    )
 
 if st.button("Translate"):
+    # Translations run in worker threads, which have no access to
+    # st.session_state, so everything they need is read here first.
+    model_name = st.session_state["model_name"]
+    translation_memory = None
+    if use_memory:
+        translation_memory = load_translation_memory(TRANSLATION_MEMORY_PATH)
     llm = ChatOpenAI(
-        model=st.session_state["model_name"],
+        model=model_name,
         openai_api_key=st.session_state["api_key"],
         temperature=0,
     )
+    language_translator_chain = prompt | llm | parser
+    target_languages = parse_languages(st.session_state["target_language"])
 
-    template = """
-    Please translate the given text into {language} language\n\n\n
+    memory_stats = {"segments": 0, "hits": 0, "misses": 0}
+    memory_stats_lock = threading.Lock()
+    # In long document mode every language panel runs its own pool of
+    # chunk translations, so the request cap is enforced here, across all
+    # of them, rather than by the size of each pool.
+    request_slots = contextlib.nullcontext()
+    if long_document_mode:
+        request_slots = threading.BoundedSemaphore(max_concurrency)
 
-    {text} \n
+    def translate_text(text, language):
+        with request_slots:
+            if use_memory:
+                translated, stats = translate_with_memory(
+                    text,
+                    language,
+                    model_name,
+                    translation_memory,
+                    lambda segments: translate_segments(
+                        segments, language, llm
+                    ),
+                )
+                with memory_stats_lock:
+                    for key in memory_stats:
+                        memory_stats[key] += stats[key]
+                return translated
 
-    Please return only the translated language
-    """
+            return language_translator_chain.invoke(
+                {
+                    "text": text,
+                    "language": language,
+                }
+            )
 
-    prompt = ChatPromptTemplate.from_template(template)
-    parser = StrOutputParser()
+    if long_document_mode:
+        chunks, separators = split_into_chunks(
+            st.session_state["input_text"],
+            chunk_tokens,
+            llm.get_num_tokens,
+        )
 
-    language_translator_chain = prompt | llm | parser
+    def translate_document(text, language):
+        if not long_document_mode:
+            return translate_text(text, language)
+        translations = translate_in_order(
+            chunks,
+            lambda chunk: translate_text(chunk, language),
+            max_workers=max_concurrency,
+        )
+        return "".join(
+            translated + separator
+            for translated, separator in zip(translations, separators)
+        )
 
-    translation = language_translator_chain.invoke(
-        {
-            "text": st.session_state["input_text"],
-            "language": st.session_state["target_language"],
-        }
-    )
+    if not target_languages:
+        st.error("Enter at least one target language.")
+    elif uploaded_file:
+        file_format = uploaded_file.name.rsplit(".", 1)[-1].lower()
+
+        def translate_file_segments(segments, language):
+            if use_memory:
+                translated, stats = translate_segments_with_memory(
+                    segments,
+                    language,
+                    model_name,
+                    translation_memory,
+                    lambda misses: translate_segments(misses, language, llm),
+                )
+                with memory_stats_lock:
+                    for key in memory_stats:
+                        memory_stats[key] += stats[key]
+                return translated
+            return translate_segments(segments, language, llm)
+
+        # Each file is read back for its download button before the
+        # directory is removed, so nothing is left behind on the server.
+        with tempfile.TemporaryDirectory(prefix="translations_") as output_dir:
+            for language in target_languages:
+                uploaded_file.seek(0)
+                lines = io.TextIOWrapper(
+                    uploaded_file, encoding="utf-8-sig", newline=""
+                )
+                output_path = os.path.join(
+                    output_dir, f"{language}_{uploaded_file.name}"
+                )
+                progress = st.empty()
+                with open(
+                    output_path, "w", encoding="utf-8", newline=""
+                ) as output_file:
+                    translate_file(
+                        lines,
+                        file_format,
+                        output_file,
+                        lambda segments: translate_file_segments(
+                            segments, language
+                        ),
+                        llm.get_num_tokens,
+                        max_tokens=chunk_tokens,
+                        max_workers=max_concurrency,
+                        on_progress=lambda written: progress.caption(
+                            f"{language}: {written} batches translated"
+                        ),
+                    )
+                # Detach so closing the wrapper does not close the upload
+                # buffer.
+                lines.detach()
+                with open(output_path, "rb") as translated_file:
+                    st.download_button(
+                        label=f"Download {language} translation",
+                        data=translated_file.read(),
+                        file_name=os.path.basename(output_path),
+                        key=f"download_{language}",
+                    )
+    elif len(target_languages) > 1:
+        panels = {}
+        for language in target_languages:
+            with st.expander(language, expanded=True):
+                panels[language] = st.empty()
+                panels[language].info("Translating...")
+
+        results = {}
+        for language, translation, error in translate_to_languages(
+            st.session_state["input_text"],
+            target_languages,
+            translate_document,
+        ):
+            if error is None:
+                results[language] = translation
+                panels[language].success(translation)
+            else:
+                panels[language].error(f"Translation failed: {error}")
+
+        st.download_button(
+            label="Download all translations",
+            data=json.dumps(results, indent=4, ensure_ascii=False),
+            file_name="translations.json",
+            mime="application/json",
+        )
+    elif long_document_mode:
+        language = target_languages[0]
+
+        def stream_translation():
+            translations = translate_in_order(
+                chunks,
+                lambda chunk: translate_text(chunk, language),
+                max_workers=max_concurrency,
+            )
+            for translated, separator in zip(translations, separators):
+                yield translated + separator
+
+        st.write(f"Translated Text ({len(chunks)} chunks):")
+        with st.container(border=True):
+            st.write_stream(stream_translation())
+    else:
+        translation = translate_text(
+            st.session_state["input_text"], target_languages[0]
+        )
+        st.write("Translated Text:")
+        st.success(translation)
 
-    st.write("Translated Text:")
-    st.success(translation)
+    if use_memory:
+        st.caption(
+            f"Translation memory: {memory_stats['hits']} of "
+            f"{memory_stats['segments']} sentences reused, "
+            f"{memory_stats['misses']} sent to the model."
+        )
@@ -0,0 +1,218 @@
+import re
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+
+SUPPORTED_EXTENSIONS = ["srt", "vtt", "md", "txt"]
+
+MARKDOWN_FENCE_PATTERN = re.compile(r"^\s*(```|~~~)")
+MARKDOWN_PREFIX_PATTERN = re.compile(
+    r"^(\s*(?:#{1,6}\s+|[-*+]\s+(?:\[[ xX]\]\s+)?|\d+[.)]\s+|>\s?)*)"
+)
+MARKDOWN_RAW_LINE_PATTERN = re.compile(
+    r"^(\s*$|(\s{4,}|\t)(?![-*+]\s|\d+[.)]\s)|\s*<!--|\s*\|?[\s:|-]+\|?\s*$"
+    r"|\s*([-*_]\s*){3,}$)"
+)
+
+
+def _split_line_ending(line):
+    body = line.rstrip("\r\n")
+    return body, line[len(body):]
+
+
+def iter_subtitle_segments(lines):
+    """
+    Parses SRT or WebVTT lines into ``(prefix, text, suffix)`` segments.
+
+    Cue numbers, timing lines, the WEBVTT header and NOTE/STYLE blocks end up
+    in ``prefix``/``suffix`` untouched; only the cue text is translatable.
+    Blocks are read one at a time, so memory does not grow with file size.
+
+    Args:
+        lines (iterable): Lines of the subtitle file, with line endings.
+
+    Yields:
+        tuple: ``(prefix, text, suffix)``; ``text`` is empty for segments
+               that must be copied verbatim.
+    """
+    block = []
+
+    def flush():
+        timing_index = next(
+            (i for i, line in enumerate(block) if "-->" in line), None
+        )
+        if timing_index is None or timing_index == len(block) - 1:
+            return "".join(block), "", ""
+        prefix = "".join(block[:timing_index + 1])
+        cue_lines = block[timing_index + 1:]
+        text, ending = _split_line_ending("".join(cue_lines))
+        return prefix, text, ending
+
+    for line in lines:
+        if line.strip():
+            block.append(line)
+            continue
+        if block:
+            yield flush()
+            block = []
+        yield line, "", ""
+    if block:
+        yield flush()
+
+
+def iter_markdown_segments(lines):
+    """
+    Parses Markdown lines into ``(prefix, text, suffix)`` segments.
+
+    Fenced and indented code, HTML comments, table separators and rules are
+    copied verbatim. Heading, list and quote markers stay in ``prefix`` so
+    only the prose is sent for translation.
+
+    Args:
+        lines (iterable): Lines of the Markdown file, with line endings.
+
+    Yields:
+        tuple: ``(prefix, text, suffix)``; ``text`` is empty for segments
+               that must be copied verbatim.
+    """
+    in_fence = False
+    for line in lines:
+        if MARKDOWN_FENCE_PATTERN.match(line):
+            in_fence = not in_fence
+            yield line, "", ""
+            continue
+        if in_fence or MARKDOWN_RAW_LINE_PATTERN.match(line):
+            yield line, "", ""
+            continue
+        body, ending = _split_line_ending(line)
+        prefix = MARKDOWN_PREFIX_PATTERN.match(body).group(1)
+        text = body[len(prefix):]
+        if text.strip():
+            yield prefix, text, ending
+        else:
+            yield line, "", ""
+
+
+def iter_text_segments(lines):
+    """
+    Treats every non-blank line of a plain text file, such as a transcript
+    saved from the YouTube apps, as one translatable segment.
+
+    Args:
+        lines (iterable): Lines of the text file, with line endings.
+
+    Yields:
+        tuple: ``(prefix, text, suffix)`` segments.
+    """
+    for line in lines:
+        body, ending = _split_line_ending(line)
+        if body.strip():
+            yield "", body, ending
+        else:
+            yield line, "", ""
+
+
+SEGMENT_PARSERS = {
+    "srt": iter_subtitle_segments,
+    "vtt": iter_subtitle_segments,
+    "md": iter_markdown_segments,
+    "txt": iter_text_segments,
+}
+
+
+def iter_batches(segments, max_tokens, count_tokens):
+    """
+    Groups segments into batches holding at most about ``max_tokens`` tokens
+    of translatable text.
+
+    Args:
+        segments (iterable): ``(prefix, text, suffix)`` segments.
+        max_tokens (int): Token budget per batch.
+        count_tokens (callable): Returns the token count of a string.
+
+    Yields:
+        list: Consecutive segments forming one batch.
+    """
+    batch, batch_tokens = [], 0
+    for segment in segments:
+        text = segment[1]
+        tokens = count_tokens(text) if text else 0
+        if batch_tokens and batch_tokens + tokens > max_tokens:
+            yield batch
+            batch, batch_tokens = [], 0
+        batch.append(segment)
+        batch_tokens += tokens
+    if batch:
+        yield batch
+
+
+def translate_batch(batch, translate_segments):
+    """
+    Translates the text of one batch and renders it back with its markup.
+
+    Args:
+        batch (list): ``(prefix, text, suffix)`` segments.
+        translate_segments (callable): Takes a list of source texts and
+                                       returns their translations in order.
+
+    Returns:
+        str: The rendered batch.
+    """
+    texts = [text for _, text, _ in batch if text]
+    translations = iter(translate_segments(texts) if texts else [])
+    return "".join(
+        prefix + (next(translations) if text else "") + suffix
+        for prefix, text, suffix in batch
+    )
+
+
+def translate_file(lines,
+                   file_format,
+                   output_file,
+                   translate_segments,
+                   count_tokens,
+                   max_tokens=1500,
+                   max_workers=4,
+                   on_progress=None):
+    """
+    Translates a subtitle, Markdown or text file and streams the result to
+    ``output_file``.
+
+    Batches are translated concurrently, but at most ``max_workers`` are in
+    flight at a time and each is written as soon as every batch before it is
+    done, so memory stays flat regardless of the file size.
+
+    Args:
+        lines (iterable): Lines of the input file, with line endings.
+        file_format (str): One of ``SUPPORTED_EXTENSIONS``.
+        output_file (file): Text file the translation is written to.
+        translate_segments (callable): Takes a list of source texts and
+                                       returns their translations in order.
+        count_tokens (callable): Returns the token count of a string.
+        max_tokens (int): Token budget per request.
+        max_workers (int): Maximum number of concurrent requests.
+        on_progress (callable, optional): Called with the number of batches
+                                          written so far.
+
+    Returns:
+        int: The number of batches translated.
+    """
+    segments = SEGMENT_PARSERS[file_format](lines)
+    written = 0
+    in_flight = deque()
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        for batch in iter_batches(segments, max_tokens, count_tokens):
+            in_flight.append(
+                executor.submit(translate_batch, batch, translate_segments)
+            )
+            if len(in_flight) < max_workers:
+                continue
+            output_file.write(in_flight.popleft().result())
+            written += 1
+            if on_progress:
+                on_progress(written)
+        while in_flight:
+            output_file.write(in_flight.popleft().result())
+            written += 1
+            if on_progress:
+                on_progress(written)
+    return written
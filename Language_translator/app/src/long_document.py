@@ -0,0 +1,111 @@
+import re
+from concurrent.futures import ThreadPoolExecutor
+
+from app.src.translation_memory import split_segments
+
+PARAGRAPH_SPLIT_PATTERN = re.compile(r"(\n\s*\n)")
+
+
+def _split_oversized(paragraph, max_tokens, count_tokens):
+    """
+    Splits a paragraph that is larger than ``max_tokens`` on sentence
+    boundaries. A single sentence over the limit is kept whole.
+
+    Returns ``(pieces, separators)`` like ``split_into_chunks``: the
+    whitespace between two pieces is returned as a separator rather than
+    left at the end of a piece, where the model would drop it.
+    """
+    segments, segment_separators = split_segments(paragraph)
+    pieces, separators = [], []
+    current, current_tokens = "", 0
+    pending_separator = ""
+    for segment, separator in zip(segments, segment_separators):
+        tokens = count_tokens(segment)
+        if current and current_tokens + tokens > max_tokens:
+            pieces.append(current)
+            separators.append(pending_separator)
+            current, current_tokens = "", 0
+        if current:
+            current += pending_separator
+        current += segment
+        current_tokens += tokens
+        pending_separator = separator
+    if current:
+        pieces.append(current)
+        separators.append(pending_separator)
+    return pieces, separators
+
+
+def split_into_chunks(text, max_tokens, count_tokens):
+    """
+    Groups paragraphs into chunks of at most ``max_tokens`` tokens.
+
+    Args:
+        text (str): The document to split.
+        max_tokens (int): Upper bound on tokens per chunk.
+        count_tokens (callable): Returns the token count of a string.
+
+    Returns:
+        tuple: ``(chunks, separators)`` where ``separators[i]`` is the
+               whitespace that followed ``chunks[i]`` in the original text.
+    """
+    parts = PARAGRAPH_SPLIT_PATTERN.split(text)
+    paragraphs = parts[0::2]
+    paragraph_separators = parts[1::2] + [""]
+
+    chunks, separators = [], []
+    current, current_tokens = "", 0
+    pending_separator = ""
+    for paragraph, separator in zip(paragraphs, paragraph_separators):
+        tokens = count_tokens(paragraph)
+        if tokens > max_tokens:
+            if current:
+                chunks.append(current)
+                separators.append(pending_separator)
+                current, current_tokens = "", 0
+            pieces, piece_separators = _split_oversized(
+                paragraph, max_tokens, count_tokens
+            )
+            chunks.extend(pieces)
+            # The paragraph's own separator follows its last piece.
+            separators.extend(piece_separators[:-1] + [separator])
+            continue
+        if current and current_tokens + tokens > max_tokens:
+            chunks.append(current)
+            separators.append(pending_separator)
+            current, current_tokens = "", 0
+        if current:
+            current += pending_separator
+        current += paragraph
+        current_tokens += tokens
+        pending_separator = separator
+    if current:
+        chunks.append(current)
+        separators.append(pending_separator)
+    return chunks, separators
+
+
+def translate_in_order(chunks, translate_chunk, max_workers=4):
+    """
+    Translates chunks concurrently and yields the results in document order.
+
+    Each result is yielded as soon as it and every chunk before it have
+    finished, so the caller can stream the translated prefix while later
+    chunks are still in flight.
+
+    Args:
+        chunks (list): The source chunks.
+        translate_chunk (callable): Translates one chunk.
+        max_workers (int): Maximum number of concurrent model calls.
+
+    Yields:
+        str: The translation of each chunk, in order.
+    """
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        futures = [executor.submit(translate_chunk, chunk) for chunk in chunks]
+        try:
+            for future in futures:
+                yield future.result()
+        finally:
+            for future in futures:
+                future.cancel()
@@ -0,0 +1,55 @@
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+
+def parse_languages(value):
+    """
+    Parses a comma or newline separated list of target languages.
+
+    Args:
+        value (str): The raw user input, e.g. "Japanese, French".
+
+    Returns:
+        list: The languages in input order, without blanks or duplicates.
+    """
+    languages = []
+    for language in value.replace("\n", ",").split(","):
+        language = language.strip()
+        if language and language.lower() not in (
+            existing.lower() for existing in languages
+        ):
+            languages.append(language)
+    return languages
+
+
+def translate_to_languages(text, languages, translate, max_workers=None):
+    """
+    Translates the same text into several languages concurrently.
+
+    Args:
+        text (str): The text to translate.
+        languages (list): The target languages.
+        translate (callable): Takes ``(text, language)`` and returns the
+                              translation.
+        max_workers (int, optional): Maximum number of concurrent
+                                     translations; by default all languages
+                                     run at once, so the whole set takes
+                                     about as long as the slowest one.
+
+    Yields:
+        tuple: ``(language, translation, error)`` in completion order;
+               ``error`` is None on success and ``translation`` is None on
+               failure.
+    """
+    if max_workers is None:
+        max_workers = max(len(languages), 1)
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        futures = {
+            executor.submit(translate, text, language): language
+            for language in languages
+        }
+        for future in as_completed(futures):
+            language = futures[future]
+            try:
+                yield language, future.result(), None
+            except Exception as e:
+                yield language, None, e
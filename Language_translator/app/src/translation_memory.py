@@ -0,0 +1,220 @@
+import hashlib
+import re
+import sqlite3
+import threading
+
+# Split after sentence punctuation followed by whitespace, or on line
+# breaks. Chinese and Japanese put no space after full-width punctuation,
+# so text is also split right after 。！？ (or after a closing quote or
+# bracket that follows one). The capturing group keeps the separators so
+# the output can be reassembled with the original spacing and layout.
+CJK_SENTENCE_END = r"(?:(?<=[。！？])|(?<=[。！？][」』）】”’]))"
+CJK_CLOSING = "」』）】”’"
+SEGMENT_SPLIT_PATTERN = re.compile(
+    rf"((?<=[.!?。！？])\s+|{CJK_SENTENCE_END}(?=[^\s{CJK_CLOSING}])|\n+)"
+)
+WHITESPACE_PATTERN = re.compile(r"\s+")
+
+
+def split_segments(text):
+    """
+    Splits text into sentence segments and the separators between them.
+
+    Args:
+        text (str): The text to split.
+
+    Returns:
+        tuple: ``(segments, separators)`` where ``separators[i]`` follows
+               ``segments[i]``; joining them back gives the original text.
+    """
+    parts = SEGMENT_SPLIT_PATTERN.split(text)
+    segments = parts[0::2]
+    separators = parts[1::2] + [""]
+    return segments, separators
+
+
+def normalize_segment(segment):
+    """
+    Normalizes a segment for lookup by collapsing whitespace.
+
+    Args:
+        segment (str): The segment to normalize.
+
+    Returns:
+        str: The normalized segment.
+    """
+    return WHITESPACE_PATTERN.sub(" ", segment).strip()
+
+
+def make_key(segment, language, model):
+    """
+    Builds the memory key for a (normalized segment, language, model) triple.
+
+    Args:
+        segment (str): The normalized source segment.
+        language (str): The target language.
+        model (str): The model name.
+
+    Returns:
+        str: A hex digest identifying the triple.
+    """
+    raw = "\x1f".join([segment, language.strip().lower(), model])
+    return hashlib.sha256(raw.encode("utf-8")).hexdigest()
+
+
+class TranslationMemory:
+    """
+    A persistent segment-level translation memory stored in SQLite.
+    """
+
+    def __init__(self, db_path):
+        """
+        Opens or creates the translation memory database.
+
+        Args:
+            db_path (str): Path to the SQLite file.
+        """
+        self._lock = threading.Lock()
+        self._connection = sqlite3.connect(db_path, check_same_thread=False)
+        with self._lock, self._connection:
+            self._connection.execute(
+                """CREATE TABLE IF NOT EXISTS translations (
+                       key TEXT PRIMARY KEY,
+                       source TEXT NOT NULL,
+                       language TEXT NOT NULL,
+                       model TEXT NOT NULL,
+                       translation TEXT NOT NULL
+                   )"""
+            )
+
+    def get_many(self, keys):
+        """
+        Looks up several keys at once.
+
+        Args:
+            keys (list): Keys built with ``make_key``.
+
+        Returns:
+            dict: Translations for the keys that were found.
+        """
+        found = {}
+        keys = list(keys)
+        # Stay below SQLite's default limit on bound parameters.
+        for start in range(0, len(keys), 500):
+            batch = keys[start:start + 500]
+            placeholders = ",".join("?" * len(batch))
+            with self._lock:
+                rows = self._connection.execute(
+                    f"SELECT key, translation FROM translations "
+                    f"WHERE key IN ({placeholders})",
+                    batch,
+                ).fetchall()
+            found.update(rows)
+        return found
+
+    def put_many(self, entries):
+        """
+        Stores several translations at once.
+
+        Args:
+            entries (list): ``(key, source, language, model, translation)``
+                            tuples.
+        """
+        with self._lock, self._connection:
+            self._connection.executemany(
+                "INSERT OR REPLACE INTO translations "
+                "(key, source, language, model, translation) "
+                "VALUES (?, ?, ?, ?, ?)",
+                entries,
+            )
+
+    def __len__(self):
+        with self._lock:
+            return self._connection.execute(
+                "SELECT COUNT(*) FROM translations"
+            ).fetchone()[0]
+
+
+def translate_segments_with_memory(segments,
+                                   language,
+                                   model,
+                                   memory,
+                                   translate_segments):
+    """
+    Translates a list of segments, only sending segments that are not in
+    the translation memory to the model.
+
+    Args:
+        segments (list): The source segments.
+        language (str): The target language.
+        model (str): The model name, part of the memory key.
+        memory (TranslationMemory): The translation memory to use.
+        translate_segments (callable): Takes a list of source segments and
+                                       returns their translations in order.
+
+    Returns:
+        tuple: The translations in input order (blank segments are returned
+               unchanged) and a dict with ``segments``, ``hits`` and
+               ``misses`` counts.
+    """
+    normalized = [normalize_segment(segment) for segment in segments]
+    keys = [
+        make_key(segment, language, model) if segment else None
+        for segment in normalized
+    ]
+
+    translations = memory.get_many(key for key in keys if key)
+    hits = sum(1 for key in keys if key in translations)
+
+    misses = {}
+    for key, segment in zip(keys, normalized):
+        if key and key not in translations:
+            misses.setdefault(key, segment)
+
+    if misses:
+        miss_keys = list(misses)
+        results = translate_segments([misses[key] for key in miss_keys])
+        memory.put_many(
+            (key, misses[key], language, model, result)
+            for key, result in zip(miss_keys, results)
+        )
+        translations.update(zip(miss_keys, results))
+
+    output = [
+        translations[key] if key else segment
+        for key, segment in zip(keys, segments)
+    ]
+    stats = {
+        "segments": sum(1 for key in keys if key),
+        "hits": hits,
+        "misses": len(misses),
+    }
+    return output, stats
+
+
+def translate_with_memory(text, language, model, memory, translate_segments):
+    """
+    Translates text segment by segment, only sending segments that are not
+    in the translation memory to the model.
+
+    Args:
+        text (str): The text to translate.
+        language (str): The target language.
+        model (str): The model name, part of the memory key.
+        memory (TranslationMemory): The translation memory to use.
+        translate_segments (callable): Takes a list of source segments and
+                                       returns their translations in order.
+
+    Returns:
+        tuple: The translated text and a dict with ``segments``, ``hits``
+               and ``misses`` counts.
+    """
+    segments, separators = split_segments(text)
+    translations, stats = translate_segments_with_memory(
+        segments, language, model, memory, translate_segments
+    )
+    output = "".join(
+        translation + separator
+        for translation, separator in zip(translations, separators)
+    )
+    return output, stats
@@ -0,0 +1,71 @@
+from collections import deque
+
+from langchain_core.chat_history import BaseChatMessageHistory
+from langchain_core.messages import HumanMessage
+
+
+def estimate_tokens(text):
+    """
+    Estimates the token count of a text at about four characters per token,
+    close enough for budgeting a history window without a tokenizer.
+
+    Args:
+        text (str): The text.
+
+    Returns:
+        int: The estimated number of tokens, at least 1.
+    """
+    return max(1, len(text) // 4)
+
+
+class WindowedChatHistory(BaseChatMessageHistory):
+    """
+    Chat history for RunnableWithMessageHistory that only keeps the latest
+    exchanges. Messages are held in a fixed-capacity ring buffer, so adding
+    one is O(1) and older messages fall out on their own. Reading returns
+    the newest messages that fit both the exchange and the token budget.
+    """
+
+    def __init__(self,
+                 max_exchanges=3,
+                 max_tokens=None,
+                 count_tokens=estimate_tokens):
+        """
+        Args:
+            max_exchanges (int): Question and answer pairs to keep.
+            max_tokens (int, optional): Token budget of the window; only the
+                                        exchange limit applies when None.
+            count_tokens (callable): Returns the token count of a text.
+        """
+        self.max_tokens = max_tokens
+        self.count_tokens = count_tokens
+        # Each message is stored with its token count, counted once.
+        self._buffer = deque(maxlen=2 * max_exchanges)
+
+    @property
+    def messages(self):
+        window = []
+        tokens = 0
+        for message, message_tokens in reversed(self._buffer):
+            if self.max_tokens is not None and window:
+                if tokens + message_tokens > self.max_tokens:
+                    break
+            window.append(message)
+            tokens += message_tokens
+        # Start the window with a question rather than half an exchange.
+        while len(window) > 1 and not isinstance(window[-1], HumanMessage):
+            window.pop()
+        window.reverse()
+        return window
+
+    def add_message(self, message):
+        content = message.content
+        if not isinstance(content, str):
+            content = str(content)
+        self._buffer.append((message, self.count_tokens(content)))
+
+    def clear(self):
+        self._buffer.clear()
+
+    def __len__(self):
+        return len(self._buffer)
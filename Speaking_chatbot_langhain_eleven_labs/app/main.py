@@ -2,13 +2,15 @@ import base64
 from datetime import datetime
 import speech_recognition as sr
 import streamlit as st
-from langchain.memory import ConversationBufferWindowMemory
-from langchain_core.chat_history import InMemoryChatMessageHistory
 from langchain_core.runnables.history import RunnableWithMessageHistory
 from langchain_openai import ChatOpenAI
 import requests
 
+from app.src.chat_history import WindowedChatHistory
+
 CHUNK_SIZE = 1024
+# Question and answer pairs the model sees from earlier in the chat.
+HISTORY_EXCHANGES = 3
 
 st.set_page_config(page_title="Speaking Conversational Chatbot")
 
@@ -70,6 +72,13 @@ model = st.sidebar.selectbox("Model", options=["gpt-4o", "gpt-4o-mini"], index=0
 
 elevenlabs_api_key = st.sidebar.text_input("ElevenLabs API Key", type="password")
 voice_id = st.sidebar.text_input("Voice ID", value="cgSgspJ2msm6clMCkdW9")
+history_tokens = st.sidebar.number_input(
+    "History token budget",
+    min_value=0,
+    value=2000,
+    step=250,
+    help="Earlier messages the model sees are cut to fit this many tokens. 0 keeps the last exchanges whatever their length.",
+)
 
 if openai_api_key:
     llm = ChatOpenAI(openai_api_key=openai_api_key, model=model)
@@ -102,28 +111,36 @@ session_id = st.sidebar.radio(
 )
 st.session_state.current_session = session_id
 
-def get_session_history(session_id: str) -> InMemoryChatMessageHistory:
+def get_session_history(session_id: str) -> WindowedChatHistory:
     if session_id not in st.session_state.store:
-        st.session_state.store[session_id] = InMemoryChatMessageHistory()
-        return st.session_state.store[session_id]
-
-    memory = ConversationBufferWindowMemory(
-        chat_memory=st.session_state.store[session_id],
-        k=3,
-        return_messages=True,
-    )
-    key = memory.memory_variables[0]
-    messages = memory.load_memory_variables({})[key]
-    st.session_state.store[session_id] = InMemoryChatMessageHistory(
-        messages=messages
-    )
-    return st.session_state.store[session_id]
+        st.session_state.store[session_id] = WindowedChatHistory(
+            HISTORY_EXCHANGES
+        )
+    history = st.session_state.store[session_id]
+    history.max_tokens = history_tokens or None
+    return history
 
 def display_message(role, content, timestamp):
     with st.chat_message(role):
         st.markdown(f"**{role.capitalize()}:** {content}")
         st.markdown(f"<small><i>{timestamp}</i></small>", unsafe_allow_html=True)
 
+def stream_reply(chain, prompt, session_id):
+    # Renders tokens into the bubble as they arrive; the history store
+    # still records the complete reply once the stream ends.
+    with st.chat_message("bot"):
+        placeholder = st.empty()
+        placeholder.markdown("**Bot:** ▌")
+        parts = []
+        for chunk in chain.stream(prompt, config={"configurable": {"session_id": session_id}}):
+            parts.append(chunk.content)
+            placeholder.markdown(f"**Bot:** {''.join(parts)}▌")
+        bot_response = "".join(parts)
+        placeholder.markdown(f"**Bot:** {bot_response}")
+        timestamp = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+        st.markdown(f"<small><i>{timestamp}</i></small>", unsafe_allow_html=True)
+    return bot_response, timestamp
+
 if openai_api_key:
     chain = RunnableWithMessageHistory(llm, get_session_history)
 
@@ -169,17 +186,8 @@ if openai_api_key:
             {"role": "user", "content": prompt, "timestamp": timestamp}
         )
 
-        with st.spinner("Thinking..."):
-            response = chain.invoke(
-                prompt,
-                config={"configurable": {"session_id": session_id}},
-            )
-            bot_response = response.content
+        bot_response, timestamp = stream_reply(chain, prompt, session_id)
 
-        timestamp = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
-        
-        display_message("bot", bot_response, timestamp)
-        
         st.session_state.messages[session_id].append(
             {"role": "bot", "content": bot_response, "timestamp": timestamp}
         )
@@ -2,11 +2,14 @@ from datetime import datetime
 
 import speech_recognition as sr
 import streamlit as st
-from langchain.memory import ConversationBufferWindowMemory
-from langchain_core.chat_history import InMemoryChatMessageHistory
 from langchain_core.runnables.history import RunnableWithMessageHistory
 from langchain_openai import ChatOpenAI
 
+from app.src.chat_history import WindowedChatHistory
+
+# Question and answer pairs the model sees from earlier in the chat.
+HISTORY_EXCHANGES = 3
+
 st.set_page_config(page_title="Conversational Chatbot")
 
 st.markdown(
@@ -32,6 +35,16 @@ openai_api_key = st.sidebar.text_input("OpenAI API Key", type="password")
 model = st.sidebar.selectbox(
     "Model", options=["gpt-4o", "gpt-4o-mini"], index=0
 )
+history_tokens = st.sidebar.number_input(
+    "History token budget",
+    min_value=0,
+    value=2000,
+    step=250,
+    help=(
+        "Earlier messages the model sees are cut to fit this many tokens. "
+        "0 keeps the last exchanges whatever their length."
+    ),
+)
 
 if openai_api_key:
     llm = ChatOpenAI(openai_api_key=openai_api_key, model=model)
@@ -65,22 +78,14 @@ session_id = st.sidebar.radio(
 st.session_state.current_session = session_id
 
 
-def get_session_history(session_id: str) -> InMemoryChatMessageHistory:
+def get_session_history(session_id: str) -> WindowedChatHistory:
     if session_id not in st.session_state.store:
-        st.session_state.store[session_id] = InMemoryChatMessageHistory()
-        return st.session_state.store[session_id]
-
-    memory = ConversationBufferWindowMemory(
-        chat_memory=st.session_state.store[session_id],
-        k=3,
-        return_messages=True,
-    )
-    key = memory.memory_variables[0]
-    messages = memory.load_memory_variables({})[key]
-    st.session_state.store[session_id] = InMemoryChatMessageHistory(
-        messages=messages
-    )
-    return st.session_state.store[session_id]
+        st.session_state.store[session_id] = WindowedChatHistory(
+            HISTORY_EXCHANGES
+        )
+    history = st.session_state.store[session_id]
+    history.max_tokens = history_tokens or None
+    return history
 
 
 if openai_api_key:
@@ -88,16 +93,45 @@ if openai_api_key:
 
     st.title("Chatbot")
 
+    def display_message(role, content, timestamp):
+        with st.chat_message(role):
+            st.markdown(f"**{role.capitalize()}: {content}**")
+            st.markdown(
+                f"<small><i>{timestamp}</i></small>", unsafe_allow_html=True
+            )
+
+    def stream_reply(prompt):
+        # Renders tokens into the bubble as they arrive; the history store
+        # still records the complete reply once the stream ends.
+        with st.chat_message("bot"):
+            placeholder = st.empty()
+            placeholder.markdown("**Bot: ▌**")
+            parts = []
+            for chunk in chain.stream(
+                prompt,
+                config={"configurable": {"session_id": session_id}},
+            ):
+                parts.append(chunk.content)
+                placeholder.markdown(f"**Bot: {''.join(parts)}▌**")
+            bot_response = "".join(parts)
+            placeholder.markdown(f"**Bot: {bot_response}**")
+            timestamp = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+            st.markdown(
+                f"<small><i>{timestamp}</i></small>", unsafe_allow_html=True
+            )
+        return bot_response, timestamp
+
+    # Created before the input row so that the history and the exchange in
+    # progress are drawn in the same place, and nothing moves on the next
+    # rerun.
+    chat_area = st.container()
+
     # Display chat messages
-    if session_id in st.session_state.messages:
-        for message in st.session_state.messages[session_id]:
-            with st.chat_message(message["role"]):
-                st.markdown(
-                    f"**{message['role'].capitalize()}: {message['content']}**"
-                )
-                st.markdown(
-                    f"<small><i>{message['timestamp']}</i></small>",
-                    unsafe_allow_html=True,
+    with chat_area:
+        if session_id in st.session_state.messages:
+            for message in st.session_state.messages[session_id]:
+                display_message(
+                    message["role"], message["content"], message["timestamp"]
                 )
 
     col1, col2 = st.columns([4, 1])
@@ -140,14 +174,11 @@ if openai_api_key:
             {"role": "user", "content": active_prompt, "timestamp": timestamp}
         )
 
-        with st.spinner("Thinking..."):
-            response = chain.invoke(
-                active_prompt,
-                config={"configurable": {"session_id": session_id}},
-            )
-            bot_response = response.content
-
-        timestamp = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+        # Both messages are drawn below the history, so no rerun is needed
+        # to show them.
+        with chat_area:
+            display_message("user", active_prompt, timestamp)
+            bot_response, timestamp = stream_reply(active_prompt)
         st.session_state.messages[session_id].append(
             {
                 "role": "bot",
@@ -155,4 +186,3 @@ if openai_api_key:
                 "timestamp": timestamp,
             }
         )
-        st.rerun()
@@ -0,0 +1,105 @@
+import argparse
+import os
+import tempfile
+import threading
+
+from dotenv import load_dotenv
+from langchain.document_loaders.parsers.audio import OpenAIWhisperParserLocal, OpenAIWhisperParser
+from langchain_openai import ChatOpenAI
+
+from app.src.batch_pipeline import run_pipeline
+from app.src.summarizer import DocumentSummarizer
+from app.src.youtube_audio_loader import download_audio, remove_audio, transcribe_audio
+
+
+def read_urls(urls_path):
+    """
+    Reads one YouTube link per line, ignoring blank lines and # comments.
+
+    Args:
+        urls_path (str): Path to the file of links.
+
+    Returns:
+        list: The links in file order, without duplicates.
+    """
+    urls = []
+    with open(urls_path, "r", encoding="utf-8") as urls_file:
+        for line in urls_file:
+            url = line.strip()
+            if url and not url.startswith("#") and url not in urls:
+                urls.append(url)
+    return urls
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(
+        description="Transcribe and summarize a list of YouTube videos."
+    )
+    parser.add_argument("urls_file", help="Text file with one YouTube link per line.")
+    parser.add_argument("--output", default="summaries.jsonl", help="JSONL file to append results to.")
+    parser.add_argument("--model", default="gpt-4o-mini", choices=["gpt-4o", "gpt-4o-mini"])
+    parser.add_argument("--use-whisper-api", action="store_true", help="Transcribe with the Whisper API instead of locally.")
+    parser.add_argument("--download-workers", type=int, default=2)
+    parser.add_argument("--transcribe-workers", type=int, default=1)
+    parser.add_argument("--summarize-workers", type=int, default=4)
+    parser.add_argument("--queue-size", type=int, default=4, help="Capacity of the queues between stages.")
+    return parser.parse_args()
+
+
+def main():
+    load_dotenv()
+    args = parse_args()
+
+    llm = ChatOpenAI(api_key=os.environ.get("OPENAI_API_KEY"), model_name=args.model)
+    summarizer = DocumentSummarizer(llm=llm)
+    local_whisper = not args.use_whisper_api
+    # Whisper parsers hold a model, so each transcribe worker keeps its own.
+    worker_state = threading.local()
+
+    def download(url):
+        save_dir = tempfile.mkdtemp(prefix="youtube_batch_")
+        try:
+            return save_dir, download_audio(url, save_dir)
+        except Exception:
+            remove_audio(save_dir)
+            raise
+
+    def transcribe(downloaded):
+        save_dir, blobs = downloaded
+        if not hasattr(worker_state, "parser"):
+            worker_state.parser = OpenAIWhisperParserLocal() if local_whisper else OpenAIWhisperParser()
+        try:
+            return transcribe_audio(blobs, parser=worker_state.parser)
+        finally:
+            remove_audio(save_dir)
+
+    def summarize(docs):
+        return docs, summarizer.summarize_documents(docs)
+
+    def to_record(url, result):
+        docs, summary = result
+        return {
+            "transcription": "\n".join(doc.page_content for doc in docs),
+            "summary": summary,
+        }
+
+    counts = run_pipeline(
+        read_urls(args.urls_file),
+        [
+            ("download", download, args.download_workers),
+            ("transcribe", transcribe, args.transcribe_workers),
+            ("summarize", summarize, args.summarize_workers),
+        ],
+        args.output,
+        to_record,
+        queue_size=args.queue_size,
+    )
+    print(
+        f"Done: {counts['ok']} summarized, {counts['error']} failed, "
+        f"{counts['skipped']} already in {args.output}."
+    )
+    print(f"Busy seconds per stage: {counts['stage_seconds']}")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,5 +1,6 @@
 from dotenv import load_dotenv
 import os 
+import time
 import streamlit as st 
 from app.src.youtube_audio_loader import youtube_transcriber
 from app.src.summarizer import DocumentSummarizer
@@ -28,6 +29,12 @@ use_whisper_api = st.sidebar.checkbox("Use Whisper API for Transcribe", value=Fa
 if use_whisper_api:
     st.sidebar.warning("Using the Whisper API may incur costs.")
 
+use_prefilter = st.sidebar.checkbox("Pre-filter transcript locally before summarizing", value=False)
+if use_prefilter:
+    extractive_ratio = st.sidebar.slider("Fraction of transcript to keep", min_value=0.1, max_value=1.0, value=0.5, step=0.05)
+else:
+    extractive_ratio = None
+
 transcribe_button = st.sidebar.button("Transcribe Video")
 summarize_button = st.sidebar.button("Summarize Transcription")
 clear_button = st.sidebar.button("Clear and Try New Video")
@@ -65,12 +72,25 @@ if st.session_state.summarizing:
     summary_container.empty()
     with st.spinner("Summarizing..."):
         llm = ChatOpenAI(api_key=openai_key, model_name=model_name)
-        summarizer = DocumentSummarizer(llm=llm)
+        summarizer = DocumentSummarizer(llm=llm, extractive_ratio=extractive_ratio)
+        start = time.perf_counter()
         st.session_state.summary = summarizer.summarize_documents(st.session_state.docs)
+        elapsed = time.perf_counter() - start
         st.session_state.summarized = True
         st.session_state.summarizing = False
         st.success("Summarization completed!")
 
+        stats = summarizer.last_prefilter_stats
+        if stats and stats["kept_tokens"]:
+            removed = stats["original_tokens"] - stats["kept_tokens"]
+            # Map-phase latency grows roughly linearly with input tokens.
+            estimated_saving = (elapsed - stats["seconds"]) * removed / stats["kept_tokens"]
+            st.info(
+                f"Pre-filter kept {stats['kept_tokens']} of {stats['original_tokens']} tokens "
+                f"({removed / stats['original_tokens']:.0%} reduction) in {stats['seconds'] * 1000:.0f} ms. "
+                f"Summarized in {elapsed:.1f}s, an estimated {estimated_saving:.1f}s faster than the full transcript."
+            )
+
 if st.session_state.summarized:
     summary_container.text_area("Summary", value=st.session_state.summary, height=200)
 
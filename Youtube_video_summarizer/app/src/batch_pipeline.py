@@ -0,0 +1,178 @@
+import json
+import os
+import queue
+import threading
+import time
+
+# Marks the end of a stage's input. Each upstream stage pushes one per
+# downstream worker once all of its own workers have finished.
+_DONE = object()
+
+
+class StageError:
+    """
+    Carries a failure from the stage it happened in to the output writer.
+
+    Attributes:
+        stage (str): Name of the stage that failed.
+        error (Exception): The raised exception.
+    """
+
+    def __init__(self, stage, error):
+        self.stage = stage
+        self.error = error
+
+
+class PipelineStage:
+    """
+    A pool of worker threads that reads ``(key, payload)`` items from one
+    bounded queue, applies ``func`` and writes results to the next queue.
+
+    Items that already carry a ``StageError`` are passed through untouched
+    so that a failure in one stage does not stall the rest of the pipeline.
+    """
+
+    def __init__(self, name, func, workers, input_queue, output_queue):
+        self.name = name
+        self.func = func
+        self.workers = workers
+        self.input_queue = input_queue
+        self.output_queue = output_queue
+        self.downstream_workers = 1
+        self._remaining = workers
+        self._lock = threading.Lock()
+        self._threads = []
+        self.busy_seconds = 0.0
+
+    def start(self):
+        for index in range(self.workers):
+            thread = threading.Thread(
+                target=self._run, name=f"{self.name}-{index}", daemon=True
+            )
+            thread.start()
+            self._threads.append(thread)
+
+    def _run(self):
+        while True:
+            item = self.input_queue.get()
+            if item is _DONE:
+                break
+            key, payload, timings = item
+            if not isinstance(payload, StageError):
+                start = time.perf_counter()
+                try:
+                    payload = self.func(payload)
+                except Exception as e:
+                    payload = StageError(self.name, e)
+                elapsed = time.perf_counter() - start
+                timings[self.name] = round(elapsed, 3)
+                with self._lock:
+                    self.busy_seconds += elapsed
+            self.output_queue.put((key, payload, timings))
+
+        with self._lock:
+            self._remaining -= 1
+            last_worker = self._remaining == 0
+        if last_worker:
+            for _ in range(self.downstream_workers):
+                self.output_queue.put(_DONE)
+
+
+def load_completed(output_path):
+    """
+    Reads the keys that already finished successfully in a previous run.
+
+    Args:
+        output_path (str): Path of the JSONL output file.
+
+    Returns:
+        set: Keys whose record has status ``ok``.
+    """
+    completed = set()
+    if not os.path.exists(output_path):
+        return completed
+    with open(output_path, "r", encoding="utf-8") as output_file:
+        for line in output_file:
+            try:
+                record = json.loads(line)
+            except json.JSONDecodeError:
+                # A crash can leave a truncated last line behind.
+                continue
+            if record.get("status") == "ok":
+                completed.add(record["url"])
+    return completed
+
+
+def run_pipeline(keys, stages, output_path, to_record, queue_size=4):
+    """
+    Runs ``keys`` through a chain of overlapping stages and streams one JSON
+    record per key to ``output_path``.
+
+    Every stage has its own worker pool and the stages are connected by
+    bounded queues, so each stage works on a different item at the same
+    time and throughput is limited by the slowest stage. Keys already
+    recorded as successful in ``output_path`` are skipped, which makes a
+    restarted run resume where the previous one stopped.
+
+    Args:
+        keys (iterable): Inputs to process; each is also the first payload.
+        stages (list): ``(name, func, workers)`` tuples, in order.
+        output_path (str): JSONL file the records are appended to.
+        to_record (callable): Turns ``(key, final_payload)`` into a dict.
+        queue_size (int): Capacity of every queue between stages.
+
+    Returns:
+        dict: Counts of ``ok``, ``error`` and ``skipped`` keys, plus the
+              busy seconds spent in each stage.
+    """
+    completed = load_completed(output_path)
+    queues = [queue.Queue(maxsize=queue_size) for _ in range(len(stages) + 1)]
+    pipeline = [
+        PipelineStage(name, func, workers, queues[i], queues[i + 1])
+        for i, (name, func, workers) in enumerate(stages)
+    ]
+    for stage, downstream in zip(pipeline, pipeline[1:]):
+        stage.downstream_workers = downstream.workers
+    for stage in pipeline:
+        stage.start()
+
+    counts = {"ok": 0, "error": 0, "skipped": 0}
+
+    def feed():
+        for key in keys:
+            if key in completed:
+                counts["skipped"] += 1
+                continue
+            queues[0].put((key, key, {}))
+        for _ in range(pipeline[0].workers):
+            queues[0].put(_DONE)
+
+    feeder = threading.Thread(target=feed, name="feeder", daemon=True)
+    feeder.start()
+
+    with open(output_path, "a", encoding="utf-8") as output_file:
+        while True:
+            item = queues[-1].get()
+            if item is _DONE:
+                break
+            key, payload, timings = item
+            if isinstance(payload, StageError):
+                record = {
+                    "url": key,
+                    "status": "error",
+                    "stage": payload.stage,
+                    "error": str(payload.error),
+                }
+                counts["error"] += 1
+            else:
+                record = {"url": key, "status": "ok", **to_record(key, payload)}
+                counts["ok"] += 1
+            record["seconds"] = timings
+            output_file.write(json.dumps(record, ensure_ascii=False) + "\n")
+            output_file.flush()
+
+    feeder.join()
+    counts["stage_seconds"] = {
+        stage.name: round(stage.busy_seconds, 3) for stage in pipeline
+    }
+    return counts
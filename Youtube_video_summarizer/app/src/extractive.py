@@ -0,0 +1,132 @@
+import re
+import time
+
+import numpy as np
+import tiktoken
+
+SENTENCE_SPLIT_PATTERN = re.compile(r"(?<=[.!?])\s+")
+WORD_PATTERN = re.compile(r"[a-z0-9']+")
+
+# Transcripts without punctuation are cut into pseudo-sentences of this
+# many words so that scoring still has something to rank.
+FALLBACK_SENTENCE_WORDS = 25
+
+
+def split_sentences(text):
+    """
+    Splits text into sentences, falling back to fixed-size word windows
+    when the text carries little or no punctuation.
+
+    Args:
+        text (str): The text to split.
+
+    Returns:
+        list: A list of sentence strings in their original order.
+    """
+    sentences = [s.strip() for s in SENTENCE_SPLIT_PATTERN.split(text)]
+    sentences = [s for s in sentences if s]
+
+    words = text.split()
+    if len(sentences) * FALLBACK_SENTENCE_WORDS * 4 < len(words):
+        sentences = [
+            " ".join(words[i:i + FALLBACK_SENTENCE_WORDS])
+            for i in range(0, len(words), FALLBACK_SENTENCE_WORDS)
+        ]
+    return sentences
+
+
+def score_sentences(sentences, damping=0.85, iterations=30):
+    """
+    Scores sentences by TextRank centrality over a TF-IDF cosine
+    similarity graph.
+
+    Args:
+        sentences (list): The sentences to score.
+        damping (float): PageRank damping factor.
+        iterations (int): Number of power iterations.
+
+    Returns:
+        np.ndarray: One score per sentence, higher is more central.
+    """
+    n = len(sentences)
+    if n == 0:
+        return np.zeros(0)
+
+    vocabulary = {}
+    rows, cols = [], []
+    for row, sentence in enumerate(sentences):
+        for word in WORD_PATTERN.findall(sentence.lower()):
+            rows.append(row)
+            cols.append(vocabulary.setdefault(word, len(vocabulary)))
+
+    if not vocabulary:
+        return np.full(n, 1.0 / n)
+
+    tf = np.zeros((n, len(vocabulary)), dtype=np.float32)
+    np.add.at(tf, (np.asarray(rows), np.asarray(cols)), 1.0)
+
+    document_frequency = np.count_nonzero(tf, axis=0)
+    idf = np.log((1.0 + n) / (1.0 + document_frequency)) + 1.0
+    tfidf = tf * idf.astype(np.float32)
+    norms = np.linalg.norm(tfidf, axis=1, keepdims=True)
+    tfidf /= np.where(norms == 0, 1.0, norms)
+
+    similarity = tfidf @ tfidf.T
+    np.fill_diagonal(similarity, 0.0)
+    row_sums = similarity.sum(axis=1, keepdims=True)
+    transition = similarity / np.where(row_sums == 0, 1.0, row_sums)
+
+    scores = np.full(n, 1.0 / n, dtype=np.float32)
+    for _ in range(iterations):
+        scores = (1.0 - damping) / n + damping * (transition.T @ scores)
+    return scores
+
+
+def extract_key_sentences(text,
+                          keep_ratio=0.5,
+                          token_budget=None,
+                          encoding_name="cl100k_base"):
+    """
+    Keeps the most central sentences of a text within a token budget while
+    preserving their original order.
+
+    Args:
+        text (str): The text to filter.
+        keep_ratio (float): Fraction of the original tokens to keep.
+        token_budget (int, optional): Hard cap on kept tokens. The smaller
+                                      of this and ``keep_ratio`` applies.
+        encoding_name (str): tiktoken encoding used to count tokens.
+
+    Returns:
+        tuple: The filtered text and a dict with ``original_tokens``,
+               ``kept_tokens`` and ``seconds`` spent filtering.
+    """
+    start = time.perf_counter()
+    sentences = split_sentences(text)
+    encoding = tiktoken.get_encoding(encoding_name)
+    token_counts = np.array(
+        [len(tokens) for tokens in encoding.encode_ordinary_batch(sentences)],
+        dtype=np.int64,
+    )
+    original_tokens = int(token_counts.sum())
+
+    budget = int(original_tokens * keep_ratio)
+    if token_budget is not None:
+        budget = min(budget, token_budget)
+
+    if budget >= original_tokens:
+        kept = sentences
+        kept_tokens = original_tokens
+    else:
+        order = np.argsort(-score_sentences(sentences), kind="stable")
+        within_budget = np.cumsum(token_counts[order]) <= budget
+        selected = np.sort(order[within_budget])
+        kept = [sentences[i] for i in selected]
+        kept_tokens = int(token_counts[selected].sum())
+
+    stats = {
+        "original_tokens": original_tokens,
+        "kept_tokens": kept_tokens,
+        "seconds": time.perf_counter() - start,
+    }
+    return " ".join(kept), stats
@@ -3,7 +3,24 @@ from langchain_text_splitters import CharacterTextSplitter
 from langchain.prompts import PromptTemplate, ChatPromptTemplate
 from langchain.chains.llm import LLMChain
 from langchain.chains.combine_documents.stuff import StuffDocumentsChain
-from langchain_text_splitters import CharacterTextSplitter
+from langchain_core.documents import Document
+
+from app.src.extractive import extract_key_sentences
+
+
+class SummaryState:
+    """
+    Rolling state kept between incremental summarization calls.
+
+    Attributes:
+        chunk_summaries (list): Map-phase summaries of every chunk seen so far.
+        summary (str): The current rolled-up summary, or None before the
+                       first segment has been summarized.
+    """
+
+    def __init__(self, chunk_summaries=None, summary=None):
+        self.chunk_summaries = list(chunk_summaries or [])
+        self.summary = summary
 
 
 class DocumentSummarizer:
@@ -11,8 +28,13 @@ class DocumentSummarizer:
                  llm, 
                  chunk_size=1000, 
                  chunk_overlap=0, 
-                 token_max=4000):
+                 token_max=4000,
+                 extractive_ratio=None,
+                 extractive_token_budget=None):
         self.llm = llm
+        self.extractive_ratio = extractive_ratio
+        self.extractive_token_budget = extractive_token_budget
+        self.last_prefilter_stats = None
         
         self.text_splitter = CharacterTextSplitter.from_tiktoken_encoder(
             chunk_size=chunk_size, chunk_overlap=chunk_overlap
@@ -54,6 +76,39 @@ Helpful Answer:"""
             return_intermediate_steps=False,
         )
 
+    def prefilter_documents(self,
+                            docs):
+        """
+        Shrink documents with the local extractive stage before the map
+        phase. Does nothing unless ``extractive_ratio`` or
+        ``extractive_token_budget`` was set.
+
+        Args:
+            docs (list): A list of documents to be filtered.
+
+        Returns:
+            list: The filtered documents. Token counts and time spent are
+                  stored in ``self.last_prefilter_stats``.
+        """
+        if self.extractive_ratio is None and self.extractive_token_budget is None:
+            return docs
+
+        stats = {"original_tokens": 0, "kept_tokens": 0, "seconds": 0.0}
+        filtered_docs = []
+        for doc in docs:
+            text, doc_stats = extract_key_sentences(
+                doc.page_content,
+                keep_ratio=self.extractive_ratio or 1.0,
+                token_budget=self.extractive_token_budget,
+            )
+            for key in stats:
+                stats[key] += doc_stats[key]
+            filtered_docs.append(
+                Document(page_content=text, metadata=doc.metadata)
+            )
+        self.last_prefilter_stats = stats
+        return filtered_docs
+
     def summarize_documents(self, 
                             docs):
         """
@@ -65,6 +120,52 @@ Helpful Answer:"""
         Returns:
             str: The summarized text.
         """
-        split_docs = self.text_splitter.split_documents(docs)
+        split_docs = self.text_splitter.split_documents(
+            self.prefilter_documents(docs)
+        )
     
-        return self.map_reduce_chain.invoke(split_docs)["output_text"]
\ No newline at end of file
+        return self.map_reduce_chain.invoke(split_docs)["output_text"]
+
+    def summarize_incremental(self,
+                              new_docs,
+                              state=None):
+        """
+        Fold a new transcript segment into an existing rolling summary.
+
+        Only the chunks of ``new_docs`` go through the map phase. The update
+        step then reduces the previous rolled-up summary together with the
+        new chunk summaries, so the cost of a refresh depends on the size of
+        the segment rather than on the length of the whole transcript.
+
+        Args:
+            new_docs (list): Documents making up the newly arrived segment.
+            state (SummaryState, optional): State returned by a previous call.
+                                            A fresh state is started if None.
+
+        Returns:
+            SummaryState: The updated state; ``state.summary`` holds the
+                          summary of everything seen so far.
+        """
+        if state is None:
+            state = SummaryState()
+
+        split_docs = self.text_splitter.split_documents(
+            self.prefilter_documents(new_docs)
+        )
+        if not split_docs:
+            return state
+
+        map_results = self.map_chain.apply(
+            [{"docs": doc.page_content} for doc in split_docs]
+        )
+        new_summaries = [result["text"] for result in map_results]
+        state.chunk_summaries.extend(new_summaries)
+
+        reduce_docs = [Document(page_content=text) for text in new_summaries]
+        if state.summary:
+            reduce_docs.insert(0, Document(page_content=state.summary))
+
+        state.summary = self.reduce_documents_chain.invoke(
+            {"input_documents": reduce_docs}
+        )["output_text"]
+        return state
\ No newline at end of file
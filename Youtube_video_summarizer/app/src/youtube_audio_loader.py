@@ -4,6 +4,51 @@ from langchain_community.document_loaders.blob_loaders.youtube_audio import (
 from langchain_community.document_loaders.generic import GenericLoader
 from langchain.document_loaders.parsers.audio import OpenAIWhisperParserLocal, OpenAIWhisperParser
 import os 
+import shutil
+
+def download_audio(youtube_video_link, save_dir):
+    """
+    Downloads the audio track of a YouTube video.
+
+    Args:
+        youtube_video_link (str): Link to the YouTube video.
+        save_dir (str): Directory the audio files are written to.
+
+    Returns:
+        list: Audio blobs ready to be passed to ``transcribe_audio``.
+    """
+    os.makedirs(save_dir, exist_ok=True)
+    return list(YoutubeAudioLoader([youtube_video_link], save_dir).yield_blobs())
+
+
+def transcribe_audio(blobs, local=True, parser=None):
+    """
+    Transcribes downloaded audio blobs with Whisper.
+
+    Args:
+        blobs (list): Audio blobs returned by ``download_audio``.
+        local (bool): Use the local Whisper model instead of the API.
+        parser (BaseBlobParser, optional): Parser to reuse across calls.
+
+    Returns:
+        list: The transcribed documents.
+    """
+    if parser is None:
+        parser = OpenAIWhisperParserLocal() if local else OpenAIWhisperParser()
+    docs = []
+    for blob in blobs:
+        docs.extend(parser.lazy_parse(blob))
+    return docs
+
+
+def remove_audio(save_dir):
+    """
+    Deletes a download directory created for ``download_audio``.
+
+    Args:
+        save_dir (str): Directory to remove.
+    """
+    shutil.rmtree(save_dir, ignore_errors=True)
 
 def youtube_transcriber(youtube_video_link, local=True):
     urls = [youtube_video_link]